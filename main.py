@@ -3,30 +3,48 @@ import json
 import logging
 import os
 from contextlib import asynccontextmanager
+from functools import partial
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel
 from starlette.staticfiles import StaticFiles
-from starlette.templating import Jinja2Templates
 from werkzeug.utils import secure_filename
 
+# Before the src imports: their module-level singletons read settings when created.
+load_dotenv()
+
 from logging_config import setup_logging
-from src.http_client import HTTPBadStatusCodeError, RMAPI
+from src.avatar_store import avatar_store
+from src.badge_server import hot_badges, serve_badge_file
+from src.batch import generate_batch, parse_usernames
+from src.dynamic_badge import clamp_size, negotiate_format, rendered_badges, serve_dynamic_badge
+from src.embed import embed_snippet, serve_loader
+from src.generation import fetch_user_data, generate_badge, refresh_stored_user
+from src.http_client import AsyncRMAPI, HTTPBadStatusCodeError, response_cache
 from src.parser import extract_data, extract_info_username_input
-from src.storage import make_storage, make_storage_js
+from src.rate_limiter import rate_limiter
+from src.refresh_scheduler import RefreshScheduler, UserRecord, user_index
+from src.render_pool import RenderPoolFullError, render_pool
+from src.static_badge import get_available_themes, warm_asset_cache
+from src.storage import badge_data_path, stored_render_inputs
+from src.templating import PrerenderedPage, create_templates, precompile
 
-load_dotenv()
 setup_logging()
 log = logging.getLogger(__name__)
 
 BASE_DIR = Path(__file__).resolve().parent
 DAILY_REFRESH_INTERVAL = 24 * 60 * 60
+API_INIT_RETRY_SEC = float(os.environ.get("API_INIT_RETRY_SEC", "30"))
+API_INIT_WAIT_SEC = float(os.environ.get("API_INIT_WAIT_SEC", "20"))
+# Seconds a client should wait while the scheduler re-renders a legacy user.
+LEGACY_RETRY_AFTER = "30"
 
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+templates = create_templates()
 templates.env.globals["static_url"] = lambda f: "/static/" + f.lstrip("/")
 
 
@@ -41,13 +59,31 @@ async def _daily_refresh(app_instance: FastAPI) -> None:
         if rm_api is None:
             continue
         try:
-            await asyncio.to_thread(rm_api.update_number_rootme_challenges)
-            await asyncio.to_thread(rm_api.update_number_rootme_users)
+            await rm_api.update_number_rootme_challenges()
+            await rm_api.update_number_rootme_users()
             log.info("Daily stats refresh completed")
         except Exception:
             log.exception("Daily stats refresh failed")
 
 
+async def _start_api(app_instance: FastAPI) -> None:
+    while True:
+        rm_api = AsyncRMAPI()
+        try:
+            await rm_api.start()
+        except Exception as exc:
+            log.exception("Root-Me API client init failed")
+            app_instance.state.api_error = str(exc)
+            await rm_api.aclose()
+            await asyncio.sleep(API_INIT_RETRY_SEC)
+            continue
+        app_instance.state.api = rm_api
+        app_instance.state.api_error = None
+        app_instance.state.api_ready.set()
+        log.info("Root-Me API client initialized")
+        return
+
+
 # ---------------------------------------------------------------------------
 # Lifespan
 # ---------------------------------------------------------------------------
@@ -57,18 +93,28 @@ async def lifespan(app: FastAPI):
     log.info("Starting RootMe Badge Generator")
     app.state.api = None
     app.state.api_error = None
-
-    try:
-        rm_api = await asyncio.to_thread(RMAPI)
-        app.state.api = rm_api
-        log.info("Root-Me API client initialized")
-    except Exception as exc:
-        log.exception("Root-Me API client init failed")
-        app.state.api_error = str(exc)
-
+    app.state.api_ready = asyncio.Event()
+    await asyncio.to_thread(warm_asset_cache)
+    await asyncio.to_thread(precompile, templates.env)
+    # The index without messages is the same for everyone: render it once.
+    app.state.index_page = PrerenderedPage.render(templates.env, "index.html", messages=[])
+    render_pool.start()
+
+    # Authentication and the stats crawl can take minutes under 429 backoff:
+    # serve right away and let badge requests wait on api_ready.
+    init_task = asyncio.create_task(_start_api(app))
     refresh_task = asyncio.create_task(_daily_refresh(app))
+    app.state.refresh_scheduler = RefreshScheduler(user_index, partial(_refresh_stored_user, app))
+    tasks = [init_task, refresh_task]
+    if app.state.refresh_scheduler.config.enabled:
+        tasks.append(asyncio.create_task(app.state.refresh_scheduler.run_forever(app.state.api_ready)))
     yield
-    refresh_task.cancel()
+    for task in tasks:
+        task.cancel()
+    user_index.flush()
+    if app.state.api is not None:
+        await app.state.api.aclose()
+    render_pool.shutdown()
     log.info("Application shutdown")
 
 
@@ -90,15 +136,19 @@ app.add_middleware(
 # Response helpers
 # ---------------------------------------------------------------------------
 
-def _render_index(request: Request, messages: Optional[list] = None):
-    return templates.TemplateResponse(request, "index.html", {"messages": messages or []})
+def _render_index(request: Request, messages: Optional[list] = None, status_code: int = 200):
+    return templates.TemplateResponse(request, "index.html", {"messages": messages or []}, status_code=status_code)
 
 
-def _render_error(request: Request, message: str):
-    return _render_index(request, [("error", message)])
+def _render_error(request: Request, message: str, status_code: int = 200):
+    return _render_index(request, [("error", message)], status_code=status_code)
 
 
-def _get_api_or_error(request: Request):
+async def _get_api_or_error(request: Request):
+    try:
+        await asyncio.wait_for(request.app.state.api_ready.wait(), timeout=API_INIT_WAIT_SEC)
+    except asyncio.TimeoutError:
+        pass
     rm_api = request.app.state.api
     if rm_api is not None:
         return rm_api, None
@@ -113,20 +163,7 @@ def _get_api_or_error(request: Request):
 # Badge generation logic
 # ---------------------------------------------------------------------------
 
-def _fetch_user_data(rm_api: RMAPI, username: str, id_auteur: int) -> dict:
-    auteurs_url = f"{rm_api.api_url}/auteurs/{id_auteur}"
-    content = rm_api.http_get(auteurs_url)
-    if content is None:
-        return {
-            "nom": username,
-            "position": rm_api.number_users,
-            "score": 0,
-            "validations": [],
-        }
-    return json.loads(content)
-
-
-def _render_badge(request: Request, data: dict, save_paths: list, js_file_path):
+def _render_badge(request: Request, data: dict, save_paths: list, js_file_path, id_auteur: int):
     return templates.TemplateResponse(
         request,
         "badge.html",
@@ -134,28 +171,29 @@ def _render_badge(request: Request, data: dict, save_paths: list, js_file_path):
             "data": data,
             "save_paths": save_paths,
             "js_file_path": js_file_path,
+            "id_auteur": id_auteur,
+            "embed_snippet": embed_snippet(data["url"], id_auteur),
             "messages": [],
         },
     )
 
 
-def _handle_badge_request(request: Request, rm_api: RMAPI, username: str):
+async def _handle_badge_request(request: Request, rm_api: AsyncRMAPI, username: str):
     url = os.environ.get("URL")
 
-    username, id_auteur, flash_message, flash_type = extract_info_username_input(username, rm_api)
+    username, id_auteur, flash_message, flash_type = await extract_info_username_input(username, rm_api)
     if flash_message is not None:
         return _render_index(request, [(flash_type, flash_message)])
 
-    raw_data = _fetch_user_data(rm_api, username, id_auteur)
-    data = extract_data(raw_data, id_auteur, rm_api, url)
+    raw_data = await fetch_user_data(rm_api, username, id_auteur)
+    data = await extract_data(raw_data, id_auteur, rm_api, url)
+    save_paths, js_file_path = await generate_badge(rm_api, data, id_auteur)
 
-    save_paths, folder_path, avatar_path = make_storage(rm_api, data)
-    data["avatar_url"] = f"{url}/{avatar_path}"
+    return _render_badge(request, data, save_paths, js_file_path, id_auteur)
 
-    dynamic_js_badge = templates.env.get_template("dynamic-js-badge.html").render(data=data)
-    js_file_path = make_storage_js(dynamic_js_badge, folder_path)
 
-    return _render_badge(request, data, save_paths, js_file_path)
+async def _refresh_stored_user(app_instance: FastAPI, rec: UserRecord) -> bool:
+    return await refresh_stored_user(app_instance.state.api, rec)
 
 
 # ---------------------------------------------------------------------------
@@ -164,7 +202,7 @@ def _handle_badge_request(request: Request, rm_api: RMAPI, username: str):
 
 @app.get("/", response_class=HTMLResponse)
 async def index_get(request: Request):
-    return _render_index(request)
+    return request.app.state.index_page.response(request)
 
 
 @app.post("/", response_class=HTMLResponse)
@@ -176,12 +214,12 @@ async def index_post(request: Request, username: Optional[str] = Form(None)):
     if not username:
         return _render_error(request, "Username is empty")
 
-    rm_api, error_response = _get_api_or_error(request)
+    rm_api, error_response = await _get_api_or_error(request)
     if error_response:
         return error_response
 
     try:
-        return _handle_badge_request(request, rm_api, username)
+        return await _handle_badge_request(request, rm_api, username)
     except HTTPBadStatusCodeError as err:
         if err.code == 429:
             msg = (
@@ -191,10 +229,148 @@ async def index_post(request: Request, username: Optional[str] = Form(None)):
         else:
             msg = f"Root-Me API error (HTTP {err.code})."
         return _render_error(request, msg)
+    except RenderPoolFullError:
+        return _render_error(request, "Too many badges are being generated right now. Please retry in a few seconds.", 503)
     except ValueError as err:
         return _render_error(request, str(err))
 
 
+class BatchRequest(BaseModel):
+    usernames: List[str]
+    concurrency: Optional[int] = None
+
+
+@app.post("/api/batch")
+async def batch_post(request: Request, body: BatchRequest):
+    """Generate badges for a list of users, streaming one NDJSON result per user as it completes."""
+    usernames = parse_usernames(body.usernames)
+    if not usernames:
+        return JSONResponse({"error": "No usernames given."}, status_code=400)
+    max_users = int(os.environ.get("BATCH_MAX_USERS", "500"))
+    if len(usernames) > max_users:
+        return JSONResponse({"error": f"At most {max_users} usernames per batch."}, status_code=413)
+
+    try:
+        await asyncio.wait_for(request.app.state.api_ready.wait(), timeout=API_INIT_WAIT_SEC)
+    except asyncio.TimeoutError:
+        return JSONResponse({"error": "Service is starting.", "details": request.app.state.api_error}, status_code=503)
+
+    concurrency = body.concurrency or int(os.environ.get("BATCH_CONCURRENCY", "4"))
+    concurrency = min(concurrency, int(os.environ.get("BATCH_MAX_CONCURRENCY", "8")))
+    results = generate_batch(request.app.state.api, usernames, concurrency)
+    lines = (json.dumps(result) + "\n" async for result in results)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+async def _stored_source(request: Request, id_auteur: int):
+    """Render inputs recorded for an already generated user."""
+    rec = await asyncio.to_thread(user_index.find, id_auteur)
+    if rec is None:
+        raise HTTPException(status_code=404, detail="Generate this user's badge from the home page first.")
+    source = await asyncio.to_thread(stored_render_inputs, rec.folder)
+    if source is None:
+        # Stored before render inputs were kept in the manifest: the scheduler re-renders
+        # them within its upstream budget rather than on a public request.
+        scheduler = request.app.state.refresh_scheduler
+        if not scheduler.config.enabled:
+            raise HTTPException(status_code=404, detail="Generate this user's badge from the home page again.")
+        scheduler.request(rec.folder)
+        raise HTTPException(
+            status_code=503, detail="This badge is being regenerated.", headers={"Retry-After": LEGACY_RETRY_AFTER}
+        )
+    return source
+
+
+def _check_theme(theme: str) -> None:
+    if theme not in get_available_themes():
+        raise HTTPException(status_code=400, detail=f"theme must be one of: {', '.join(get_available_themes())}")
+
+
+@app.get("/badge/{id_auteur}.png")
+async def dynamic_badge(
+    request: Request,
+    id_auteur: int,
+    theme: str = "light",
+    w: Optional[int] = None,
+    h: Optional[int] = None,
+    format: Optional[str] = None,
+):
+    """Badge of an already generated user at any allowed size, as PNG, WebP or AVIF."""
+    _check_theme(theme)
+    fmt, negotiated = negotiate_format(format, request.headers.get("accept", ""))
+    size = clamp_size(w, h)
+    source = await _stored_source(request, id_auteur)
+    try:
+        return await serve_dynamic_badge(request, source, theme, size, fmt, negotiated)
+    except RenderPoolFullError:
+        raise HTTPException(status_code=503, detail="Too many badges are being rendered right now.")
+
+
+@app.get("/badge/{id_auteur}.svg")
+async def dynamic_svg_badge(
+    request: Request,
+    id_auteur: int,
+    theme: str = "light",
+    w: Optional[int] = None,
+    h: Optional[int] = None,
+):
+    """Vector badge of an already generated user, avatar and font included."""
+    _check_theme(theme)
+    size = clamp_size(w, h)
+    source = await _stored_source(request, id_auteur)
+    try:
+        return await serve_dynamic_badge(request, source, theme, size, "svg", False)
+    except RenderPoolFullError:
+        raise HTTPException(status_code=503, detail="Too many badges are being rendered right now.")
+
+
+@app.get("/badge/embed.js")
+async def badge_loader(request: Request):
+    """Shared script that draws every ``data-rootme-badge`` placeholder of a page."""
+    return await serve_loader(request)
+
+
+@app.get("/badge/{id_auteur}.json")
+async def badge_data(request: Request, id_auteur: int):
+    """What the embed loader draws for one user."""
+    rec = await asyncio.to_thread(user_index.find, id_auteur)
+    if rec is None:
+        raise HTTPException(status_code=404, detail="Generate this user's badge from the home page first.")
+    return await serve_badge_file(request, badge_data_path(rec.folder))
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz(request: Request):
+    """Root-Me API client state; not a probe, badges are served while the API is down."""
+    rm_api = request.app.state.api
+    if rm_api is None:
+        content = {"status": "starting", "error": request.app.state.api_error}
+        return JSONResponse(content, status_code=503)
+    return {
+        "status": "ready",
+        "number_users": rm_api.number_users,
+        "number_challenges": rm_api.number_challenges,
+    }
+
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    return {
+        "rate_limiter": await asyncio.to_thread(rate_limiter.metrics),
+        "http_cache": await asyncio.to_thread(response_cache.stats),
+        "render_pool": render_pool.metrics(),
+        "badge_cache": hot_badges.stats(),
+        "dynamic_badges": rendered_badges.stats(),
+        "avatars": avatar_store.metrics(),
+        "badge_refresh": request.app.state.refresh_scheduler.metrics(),
+    }
+
+
 @app.get("/storage_server/{filename}")
 async def serve_files(filename: str):
     filename = secure_filename(filename)
@@ -205,14 +381,14 @@ async def serve_files(filename: str):
 
 
 @app.get("/storage_clients/{folder}/{filename}")
-async def serve_files_clients(folder: str, filename: str):
+async def serve_files_clients(request: Request, folder: str, filename: str):
     folder = secure_filename(folder)
     filename = secure_filename(filename)
-    path = BASE_DIR / "storage_clients" / folder / filename
-    if not path.is_file():
+    if not folder or not filename:
         raise HTTPException(status_code=404)
-    media_type = "text/javascript" if filename == "badge.js" else None
-    return FileResponse(path, media_type=media_type)
+    response = await serve_badge_file(request, BASE_DIR / "storage_clients" / folder / filename)
+    user_index.mark_served(folder)
+    return response
 
 
 app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
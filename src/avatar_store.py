@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+import magic
+
+from src.http_client import AsyncRMAPI
+
+log = logging.getLogger(__name__)
+
+AVATARS_FOLDER = "avatars"
+# Outside the served avatars folder; secure_filename() drops the dot, so no route reaches it.
+REFS_FOLDER = ".avatar_refs"
+
+
+@dataclass
+class AvatarRef:
+    url: str
+    sha256: str
+    file: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    checked_at: float = 0.0
+
+
+class AvatarStore:
+    """Avatars stored once per content under ``STORAGE_FOLDER/avatars``.
+
+    Files are named after the SHA-256 of their bytes, so users sharing an
+    avatar (e.g. the Root-Me default) share one file. Each avatar URL keeps
+    a small JSON reference with the upstream ETag/Last-Modified, in
+    ``STORAGE_FOLDER/.avatar_refs`` so it is not served; it is used to
+    revalidate with a conditional GET once ``AVATAR_REVALIDATE_SEC`` has
+    passed, and a 304 or identical bytes reuse the stored file without
+    re-sniffing its type.
+    """
+
+    def __init__(self, root: Optional[Path] = None) -> None:
+        self.root = root or Path(os.environ.get("STORAGE_FOLDER", "storage_clients")) / AVATARS_FOLDER
+        self.downloads = 0
+        self.not_modified = 0
+        self.reused = 0
+        self.bytes_downloaded = 0
+
+    @property
+    def refs_root(self) -> Path:
+        return self.root.parent / REFS_FOLDER
+
+    @staticmethod
+    def _revalidate_sec() -> float:
+        return float(os.environ.get("AVATAR_REVALIDATE_SEC", "3600"))
+
+    def _ref_path(self, url: str) -> Path:
+        return self.refs_root / f"{hashlib.md5(url.encode()).hexdigest()}.json"
+
+    def _load_ref(self, url: str) -> Optional[AvatarRef]:
+        path = self._ref_path(url)
+        legacy = self.root / path.name
+        try:
+            if not path.exists() and legacy.exists():
+                # References used to be kept next to the (publicly served) avatars.
+                self.refs_root.mkdir(parents=True, exist_ok=True)
+                legacy.replace(path)
+            ref = AvatarRef(**json.loads(path.read_text()))
+        except (OSError, ValueError, TypeError):
+            return None
+        return ref if ref.url == url and (self.root / ref.file).is_file() else None
+
+    def _save_ref(self, ref: AvatarRef) -> None:
+        path = self._ref_path(ref.url)
+        self.refs_root.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(asdict(ref)))
+        tmp.replace(path)
+
+    def _store_content(self, content: bytes, sha256: str, previous: Optional[AvatarRef]) -> str:
+        if previous is not None and previous.sha256 == sha256:
+            self.reused += 1
+            return previous.file
+        extension = magic.from_buffer(content, mime=True).split("/")[-1]
+        name = f"{sha256}.{extension}"
+        # Same bytes, same type: only the final name can hold them (not a writer's .tmp file).
+        if (self.root / name).is_file():
+            self.reused += 1
+            return name
+        tmp = self.root / f"{name}.{os.getpid()}.tmp"
+        tmp.write_bytes(content)
+        tmp.replace(self.root / name)
+        return name
+
+    async def fetch(self, api: AsyncRMAPI, url: str) -> AvatarRef:
+        """Stored avatar for ``url``, downloading or revalidating it when needed."""
+        ref = await asyncio.to_thread(self._load_ref, url)
+        if ref is not None and time.time() - ref.checked_at < self._revalidate_sec():
+            return ref
+
+        response = await api.conditional_get(
+            url,
+            etag=ref.etag if ref else None,
+            last_modified=ref.last_modified if ref else None,
+        )
+        if response.not_modified and ref is not None:
+            self.not_modified += 1
+            ref.checked_at = time.time()
+        elif response.content is not None:
+            self.downloads += 1
+            self.bytes_downloaded += len(response.content)
+            sha256 = hashlib.sha256(response.content).hexdigest()
+            self.root.mkdir(parents=True, exist_ok=True)
+            file = await asyncio.to_thread(self._store_content, response.content, sha256, ref)
+            ref = AvatarRef(url, sha256, file, response.etag, response.last_modified, time.time())
+        else:
+            raise ValueError(f"Could not download the Root-Me avatar (HTTP {response.status_code}).")
+        await asyncio.to_thread(self._save_ref, ref)
+        return ref
+
+    def path(self, ref: AvatarRef) -> Path:
+        return self.root / ref.file
+
+    def metrics(self) -> Dict[str, int]:
+        return dict(
+            downloads=self.downloads,
+            not_modified=self.not_modified,
+            reused=self.reused,
+            bytes_downloaded=self.bytes_downloaded,
+        )
+
+
+avatar_store = AvatarStore()
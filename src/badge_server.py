@@ -0,0 +1,375 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+
+log = logging.getLogger(__name__)
+
+MEDIA_TYPES: Dict[str, str] = {
+    ".png": "image/png",
+    ".js": "text/javascript",
+    ".json": "application/json",
+    ".gif": "image/gif",
+    ".jpeg": "image/jpeg",
+    ".jpg": "image/jpeg",
+    ".webp": "image/webp",
+    ".avif": "image/avif",
+    ".svg": "image/svg+xml",
+}
+
+# Sibling encodings of a static PNG badge, most preferred first.
+PNG_ALTERNATIVES = ((".avif", "image/avif"), (".webp", "image/webp"))
+
+
+# ---------------------------------------------------------------------------
+# Validators index
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class BadgeMeta:
+    etag: str
+    last_modified: str
+    mtime_ns: int
+    size: int
+    checked_at: float
+
+
+def _strong_etag(content: bytes) -> str:
+    return '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+
+
+class BadgeIndex:
+    """ETag and Last-Modified of served badge files, keyed by (folder, filename).
+
+    Entries are filled when a badge is written or first served, so a
+    conditional request can be answered without touching the volume. Files
+    rewritten by another worker are noticed by re-checking the mtime once
+    every ``BADGE_ETAG_RECHECK_SEC``. Absent AVIF/WebP siblings are
+    remembered too, at most ``BADGE_MISSING_CACHE_SIZE`` of them.
+    """
+
+    def __init__(self, max_missing: Optional[int] = None) -> None:
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], BadgeMeta] = {}
+        self._missing: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        if max_missing is None:
+            max_missing = int(os.environ.get("BADGE_MISSING_CACHE_SIZE", "4096"))
+        self.max_missing = max_missing
+
+    @staticmethod
+    def _recheck_sec() -> float:
+        return float(os.environ.get("BADGE_ETAG_RECHECK_SEC", "60"))
+
+    def record(self, path: Path, content: bytes, stat: Optional[os.stat_result] = None) -> BadgeMeta:
+        # Pass the stat taken *before* reading so a concurrent rewrite shows up as an mtime change.
+        stat = stat or path.stat()
+        meta = BadgeMeta(
+            etag=_strong_etag(content),
+            last_modified=formatdate(stat.st_mtime, usegmt=True),
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            checked_at=time.time(),
+        )
+        with self._lock:
+            self._entries[(path.parent.name, path.name)] = meta
+            self._missing.pop((path.parent.name, path.name), None)
+        return meta
+
+    def lookup(self, path: Path) -> Optional[BadgeMeta]:
+        """Known validators for ``path``, or None if the file must be (re)read."""
+        key = (path.parent.name, path.name)
+        with self._lock:
+            meta = self._entries.get(key)
+        if meta is None:
+            return None
+        if time.time() - meta.checked_at < self._recheck_sec():
+            return meta
+        try:
+            stat = path.stat()
+        except OSError:
+            self.discard(path)
+            return None
+        if stat.st_mtime_ns != meta.mtime_ns or stat.st_size != meta.size:
+            return None
+        meta = BadgeMeta(meta.etag, meta.last_modified, meta.mtime_ns, meta.size, time.time())
+        with self._lock:
+            self._entries[key] = meta
+        return meta
+
+    def discard(self, path: Path) -> None:
+        with self._lock:
+            self._entries.pop((path.parent.name, path.name), None)
+            self._missing.pop((path.parent.name, path.name), None)
+
+    def mark_missing(self, path: Path) -> None:
+        key = (path.parent.name, path.name)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._missing.pop(key, None)
+            self._missing[key] = time.time()
+            while len(self._missing) > self.max_missing:
+                self._missing.popitem(last=False)
+
+    def known_missing(self, path: Path) -> bool:
+        """True if ``path`` was found missing less than ``BADGE_ETAG_RECHECK_SEC`` ago."""
+        key = (path.parent.name, path.name)
+        with self._lock:
+            missing_at = self._missing.get(key)
+            if missing_at is None:
+                return False
+            if time.time() - missing_at >= self._recheck_sec():
+                del self._missing[key]
+                return False
+            return True
+
+    def invalidate_folder(self, folder_path: Path) -> None:
+        folder = Path(folder_path).name
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == folder]:
+                del self._entries[key]
+            for key in [k for k in self._missing if k[0] == folder]:
+                del self._missing[key]
+
+
+badge_index = BadgeIndex()
+
+
+# ---------------------------------------------------------------------------
+# Hot badge cache
+# ---------------------------------------------------------------------------
+
+class HotBadgeCache:
+    """Size-bounded LRU of recently served badge files.
+
+    Entries are tagged with the ETag they were read under and only returned
+    while :data:`badge_index` still reports that ETag, so a rewrite noticed by
+    the index (or an explicit invalidation) never serves old bytes.
+    ``BADGE_MEMORY_CACHE_BYTES`` bounds the total size (0 disables the cache).
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None) -> None:
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("BADGE_MEMORY_CACHE_BYTES", str(32 * 1024 * 1024)))
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, bytes]]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_served = 0
+        self.bytes_from_memory = 0
+
+    def get(self, path: Path, etag: Optional[str]) -> Optional[bytes]:
+        key = (path.parent.name, path.name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if etag is None:
+                # Not known to exist yet; counted by count_miss once it is read.
+                return None
+            if entry is None or entry[0] != etag:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, path: Path, etag: str, content: bytes) -> None:
+        # A single file may take at most an eighth of the cache.
+        if len(content) * 8 > self.max_bytes:
+            return
+        key = (path.parent.name, path.name)
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (etag, content)
+            self.size += len(content)
+            while self.size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _pop(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def discard(self, path: Path) -> None:
+        with self._lock:
+            self._pop((path.parent.name, path.name))
+
+    def invalidate_folder(self, folder_path: Path) -> None:
+        folder = Path(folder_path).name
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == folder]:
+                self._pop(key)
+
+    def count_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def count_served(self, size: int, from_memory: bool) -> None:
+        with self._lock:
+            self.bytes_served += size
+            if from_memory:
+                self.bytes_from_memory += size
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return dict(
+                entries=len(self._entries),
+                size_bytes=self.size,
+                max_bytes=self.max_bytes,
+                hits=self.hits,
+                misses=self.misses,
+                hit_ratio=round(self.hits / lookups, 4) if lookups else 0.0,
+                evictions=self.evictions,
+                bytes_served=self.bytes_served,
+                bytes_from_memory=self.bytes_from_memory,
+            )
+
+
+hot_badges = HotBadgeCache()
+
+
+def invalidate_folder(folder_path: Path) -> None:
+    """Forget validators and cached bytes of every file in a user's folder."""
+    badge_index.invalidate_folder(folder_path)
+    hot_badges.invalidate_folder(folder_path)
+
+
+def discard(path: Path) -> None:
+    badge_index.discard(path)
+    hot_badges.discard(path)
+
+
+# ---------------------------------------------------------------------------
+# Conditional GET
+# ---------------------------------------------------------------------------
+
+def cache_control() -> str:
+    max_age = int(os.environ.get("BADGE_CACHE_MAX_AGE_SEC", "3600"))
+    swr = int(os.environ.get("BADGE_STALE_WHILE_REVALIDATE_SEC", "86400"))
+    return f"public, max-age={max_age}, stale-while-revalidate={swr}"
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison (RFC 9110 13.1.2).
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == bare for tag in if_none_match.split(","))
+
+
+def accepts(accept: str, media_type: str) -> bool:
+    """Whether an Accept header value lists ``media_type`` with a non-zero quality."""
+    for item in accept.split(","):
+        kind, *params = [part.strip() for part in item.split(";")]
+        if kind.lower() != media_type:
+            continue
+        quality = next((p[2:] for p in params if p.startswith("q=")), "1")
+        try:
+            return float(quality) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    return if_none_match is not None and _etag_matches(if_none_match, etag)
+
+
+def _not_modified_since(if_modified_since: str, meta: BadgeMeta) -> bool:
+    try:
+        return parsedate_to_datetime(meta.last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+def is_not_modified(request: Request, meta: BadgeMeta) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, meta.etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    return if_modified_since is not None and _not_modified_since(if_modified_since, meta)
+
+
+def _validator_headers(meta: BadgeMeta) -> Dict[str, str]:
+    return {"ETag": meta.etag, "Last-Modified": meta.last_modified, "Cache-Control": cache_control()}
+
+
+def _read_with_stat(path: Path) -> Tuple[bytes, os.stat_result]:
+    stat = path.stat()
+    return path.read_bytes(), stat
+
+
+def _badge_response(path: Path, content: bytes, meta: BadgeMeta, headers: Dict[str, str]) -> Response:
+    media_type = MEDIA_TYPES.get(path.suffix.lower(), "application/octet-stream")
+    return Response(content=content, media_type=media_type, headers={**_validator_headers(meta), **headers})
+
+
+async def _serve_file(
+    request: Request, path: Path, headers: Dict[str, str], remember_missing: bool = False
+) -> Optional[Response]:
+    """Response for ``path``, or None if it does not exist.
+
+    Only ``remember_missing`` lookups are negatively cached: the paths are
+    picked by the client, so caching every 404 would grow without bound.
+    """
+    meta = badge_index.lookup(path)
+    if meta is not None and is_not_modified(request, meta):
+        return Response(status_code=304, headers={**_validator_headers(meta), **headers})
+    content = hot_badges.get(path, meta.etag if meta is not None else None)
+    if content is not None:
+        hot_badges.count_served(len(content), from_memory=True)
+        return _badge_response(path, content, meta, headers)
+    if meta is None and badge_index.known_missing(path):
+        return None
+
+    try:
+        content, stat = await asyncio.to_thread(_read_with_stat, path)
+    except (FileNotFoundError, IsADirectoryError):
+        hot_badges.discard(path)
+        if remember_missing:
+            badge_index.mark_missing(path)
+        return None
+    if meta is None:
+        hot_badges.count_miss()
+    meta = badge_index.record(path, content, stat)
+    hot_badges.put(path, meta.etag, content)
+    if is_not_modified(request, meta):
+        return Response(status_code=304, headers={**_validator_headers(meta), **headers})
+
+    hot_badges.count_served(len(content), from_memory=False)
+    return _badge_response(path, content, meta, headers)
+
+
+async def _png_exists(path: Path) -> bool:
+    return badge_index.lookup(path) is not None or await asyncio.to_thread(path.is_file)
+
+
+async def serve_badge_file(request: Request, path: Path) -> Response:
+    """Serve a stored badge file; PNG badges are swapped for an AVIF/WebP sibling the client accepts."""
+    headers: Dict[str, str] = {}
+    if path.suffix.lower() == ".png" and await _png_exists(path):
+        headers["Vary"] = "Accept"
+        accept = request.headers.get("accept", "")
+        for suffix, media_type in PNG_ALTERNATIVES:
+            if accepts(accept, media_type):
+                response = await _serve_file(request, path.with_suffix(suffix), headers, remember_missing=True)
+                if response is not None:
+                    return response
+    response = await _serve_file(request, path, headers)
+    if response is None:
+        raise HTTPException(status_code=404)
+    return response
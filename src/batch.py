@@ -0,0 +1,181 @@
+"""Generate badges for many Root-Me users at once.
+
+    python -m src.batch alice bob-2001 --file team.txt > results.ndjson
+
+Prints one JSON object per user as soon as it is done (NDJSON), in
+completion order, and a progress line per user on stderr. A user that
+fails is reported with ``"status": "error"`` and the batch goes on.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+# As in main.py: the src singletons read their settings when they are created.
+load_dotenv()
+
+from logging_config import setup_logging
+from src.embed import embed_snippet
+from src.generation import fetch_user_data, generate_badge
+from src.http_client import AsyncRMAPI, HTTPBadStatusCodeError
+from src.parser import extract_data, extract_info_username_input
+from src.refresh_scheduler import user_index
+from src.render_pool import RenderPoolFullError, render_pool
+
+log = logging.getLogger(__name__)
+
+
+def parse_usernames(lines: Iterable[str]) -> List[str]:
+    """Usernames or ``name-id`` pairs, one per entry; blanks, ``#`` comments and duplicates are dropped."""
+    seen = {}
+    for line in lines:
+        name = line.split("#", 1)[0].strip()
+        if name:
+            seen.setdefault(name, None)
+    return list(seen)
+
+
+def _plain_text(message: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"<[^>]+>", " ", message)).strip()
+
+
+async def _render_with_retry(rm_api: AsyncRMAPI, data: Dict, id_auteur: int):
+    # A batch should wait for the render pool rather than fail users when it is busy.
+    attempts = int(os.environ.get("BATCH_RENDER_ATTEMPTS", "5"))
+    for attempt in range(attempts):
+        try:
+            return await generate_badge(rm_api, data, id_auteur)
+        except RenderPoolFullError:
+            if attempt == attempts - 1:
+                raise
+            await asyncio.sleep(min(8.0, 0.5 * 2 ** attempt))
+
+
+async def generate_one(rm_api: AsyncRMAPI, username: str) -> Dict:
+    url = os.environ.get("URL")
+    started = time.perf_counter()
+    result: Dict = {"input": username}
+    try:
+        name, id_auteur, message, kind = await extract_info_username_input(username, rm_api)
+        if message is not None:
+            result.update(status="ambiguous" if kind == "info" else "error", error=_plain_text(message))
+            return result
+        raw_data = await fetch_user_data(rm_api, name, id_auteur)
+        data = await extract_data(raw_data, id_auteur, rm_api, url)
+        save_paths, js_file_path = await _render_with_retry(rm_api, data, id_auteur)
+    except HTTPBadStatusCodeError as err:
+        result.update(status="error", error=f"Root-Me API error (HTTP {err.code}).")
+    except RenderPoolFullError as err:
+        result.update(status="error", error=str(err))
+    except ValueError as err:
+        result.update(status="error", error=str(err))
+    except Exception as err:
+        log.exception("batch_user_failed", extra=dict(username=username))
+        result.update(status="error", error=f"Internal error: {type(err).__name__}")
+    else:
+        result.update(
+            status="ok",
+            fullname=data["fullname"],
+            id_auteur=int(id_auteur),
+            score=data["score"],
+            rank=data["rank"],
+            ranking=data["ranking"],
+            badges=[dict(theme=item["theme"], url=f"{url}/{item['path']}") for item in save_paths],
+            js=f"{url}/{js_file_path}",
+            embed=embed_snippet(url, id_auteur),
+        )
+    finally:
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+async def generate_batch(
+    rm_api: AsyncRMAPI, usernames: List[str], concurrency: Optional[int] = None
+) -> AsyncIterator[Dict]:
+    """Yield one result per username as it completes, with ``done``/``total`` progress.
+
+    At most ``concurrency`` users (BATCH_CONCURRENCY) are in flight; the
+    upstream requests still go through the shared cache and rate limiter.
+    """
+    concurrency = concurrency or int(os.environ.get("BATCH_CONCURRENCY", "4"))
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(username: str) -> Dict:
+        async with semaphore:
+            return await generate_one(rm_api, username)
+
+    tasks = [asyncio.create_task(run(username)) for username in usernames]
+    failed = 0
+    try:
+        for done, next_result in enumerate(asyncio.as_completed(tasks), 1):
+            result = await next_result
+            failed += result["status"] != "ok"
+            result.update(done=done, total=len(tasks), failed=failed)
+            yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+    log.info("batch_completed", extra=dict(total=len(tasks), failed=failed))
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _read_inputs(args: argparse.Namespace) -> List[str]:
+    lines = list(args.usernames)
+    for path in args.file or []:
+        if path == "-":
+            lines.extend(sys.stdin)
+        else:
+            lines.extend(Path(path).read_text().splitlines())
+    return parse_usernames(lines)
+
+
+async def _run(args: argparse.Namespace) -> int:
+    usernames = _read_inputs(args)
+    if not usernames:
+        print("No usernames given.", file=sys.stderr)
+        return 2
+
+    render_pool.start()
+    failed = 0
+    try:
+        # Inside the try: a failed login must still shut the render pool down.
+        rm_api = await AsyncRMAPI.create()
+        try:
+            async for result in generate_batch(rm_api, usernames, args.concurrency):
+                print(json.dumps(result), flush=True)
+                failed = result["failed"]
+                detail = result.get("fullname") or result.get("error")
+                print(f"[{result['done']}/{result['total']}] {result['input']}: {result['status']} ({detail})", file=sys.stderr)
+        finally:
+            await rm_api.aclose()
+    finally:
+        render_pool.shutdown()
+        user_index.flush()
+    print(f"{len(usernames) - failed} generated, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.batch", description="Generate Root-Me badges in bulk (NDJSON on stdout).")
+    parser.add_argument("usernames", nargs="*", help="usernames or name-id pairs")
+    parser.add_argument("-f", "--file", action="append", help="file with one username per line ('-' for stdin)")
+    parser.add_argument("-c", "--concurrency", type=int, default=None, help="users processed at once (BATCH_CONCURRENCY)")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    return asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from PIL import features
+
+from src.badge_server import accepts, cache_control, etag_matches
+from src.render_pool import render_pool
+from src.static_badge import DEFAULT_SIZE
+
+log = logging.getLogger(__name__)
+
+MEDIA_TYPES: Dict[str, str] = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "avif": "image/avif",
+    "svg": "image/svg+xml",
+}
+
+# Preferred first when the client accepts several.
+NEGOTIATION_ORDER = ("avif", "webp", "png")
+
+
+# ---------------------------------------------------------------------------
+# Parameters
+# ---------------------------------------------------------------------------
+
+def allowed_sizes() -> List[Tuple[int, int]]:
+    """BADGE_SIZES, e.g. ``250x100,500x200``, sorted by width."""
+    raw = os.environ.get("BADGE_SIZES") or "250x100,375x150,500x200,750x300,1000x400"
+    sizes = []
+    for part in raw.split(","):
+        width, sep, height = part.strip().partition("x")
+        if sep:
+            sizes.append((int(width), int(height)))
+    return sorted(sizes)
+
+
+def clamp_size(width: Optional[int], height: Optional[int]) -> Tuple[int, int]:
+    """Smallest allowed size at least as large as requested, or the largest one."""
+    sizes = allowed_sizes()
+    if width is None and height is None:
+        width = DEFAULT_SIZE[0]
+    for size in sizes:
+        if (width is None or size[0] >= width) and (height is None or size[1] >= height):
+            return size
+    return sizes[-1]
+
+
+def _supported_formats() -> List[str]:
+    formats = ["png"]
+    formats += [fmt for fmt in ("webp", "avif") if features.check(fmt)]
+    return formats
+
+
+def negotiate_format(requested: Optional[str], accept: str) -> Tuple[str, bool]:
+    """Output format and whether it was chosen from the Accept header (so the response varies on it)."""
+    supported = _supported_formats()
+    if requested and requested != "auto":
+        if requested not in supported:
+            raise HTTPException(status_code=400, detail=f"format must be one of: auto, {', '.join(supported)}")
+        return requested, False
+    for fmt in NEGOTIATION_ORDER:
+        if fmt in supported and (fmt == "png" or accepts(accept, MEDIA_TYPES[fmt])):
+            return fmt, True
+    return "png", True
+
+
+# ---------------------------------------------------------------------------
+# Rendered badge cache
+# ---------------------------------------------------------------------------
+
+RenderKey = Tuple[str, str, int, int, str]  # (input digest, theme, width, height, format)
+
+
+class RenderedBadgeCache:
+    """Size-bounded LRU of encoded badges keyed by render parameters.
+
+    The key includes the user's input digest, so a re-render with new data
+    simply stops hitting the old entries. ``BADGE_RENDER_CACHE_BYTES``
+    bounds the total size.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None) -> None:
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("BADGE_RENDER_CACHE_BYTES", str(16 * 1024 * 1024)))
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[RenderKey, bytes]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: RenderKey) -> Optional[bytes]:
+        with self._lock:
+            content = self._entries.get(key)
+            if content is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return content
+
+    def set(self, key: RenderKey, content: bytes) -> None:
+        if len(content) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = content
+            self.size += len(content)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return dict(
+                entries=len(self._entries),
+                size_bytes=self.size,
+                max_bytes=self.max_bytes,
+                hits=self.hits,
+                misses=self.misses,
+                hit_ratio=round(self.hits / lookups, 4) if lookups else 0.0,
+                evictions=self.evictions,
+            )
+
+
+rendered_badges = RenderedBadgeCache()
+
+
+# ---------------------------------------------------------------------------
+# Serving
+# ---------------------------------------------------------------------------
+
+async def serve_dynamic_badge(
+    request: Request,
+    source: Tuple[str, Dict, Path],
+    theme: str,
+    size: Tuple[int, int],
+    fmt: str,
+    negotiated: bool,
+) -> Response:
+    digest, data, avatar_path = source
+    key: RenderKey = (digest, theme, size[0], size[1], fmt)
+    etag = f'"{digest[:24]}-{theme}-{size[0]}x{size[1]}-{fmt}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control()}
+    if negotiated:
+        headers["Vary"] = "Accept"
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    content = rendered_badges.get(key)
+    if content is None:
+        content = await render_pool.render_bytes(data, str(avatar_path), theme, size, fmt)
+        rendered_badges.set(key, content)
+    return Response(content=content, media_type=MEDIA_TYPES[fmt], headers=headers)
+
@@ -0,0 +1,67 @@
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from src.badge_server import cache_control, etag_matches
+
+LOADER_PATH = Path(__file__).resolve().parent.parent / "static" / "assets" / "js" / "rootme-badge.js"
+
+# The loader URL carries its content hash, so a versioned request can be cached for good.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@lru_cache(maxsize=1)
+def _loader() -> bytes:
+    return LOADER_PATH.read_bytes()
+
+
+def loader_version() -> str:
+    return hashlib.sha256(_loader()).hexdigest()[:12]
+
+
+def loader_url(url: str) -> str:
+    return f"{url}/badge/embed.js?v={loader_version()}"
+
+
+def embed_snippet(url: str, id_auteur: int) -> str:
+    """HTML to paste in a page to show the badge of ``id_auteur``."""
+    return f'<div data-rootme-badge="{int(id_auteur)}"></div>\n<script async src="{url}/badge/embed.js"></script>'
+
+
+def badge_payload(data: Dict) -> bytes:
+    """What the loader needs to draw a badge (``extract_data`` output), as compact JSON."""
+    payload = dict(
+        name=data["name"],
+        rank=data["rank"],
+        score=data["score"],
+        top=data["top"],
+        solved=data["challenge"]["solved"],
+        challenges=data["challenge"]["total"],
+        avatar_url=data["avatar_url"],
+    )
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def legacy_script(url: str, id_auteur: int) -> bytes:
+    """badge.js for embeds made before the loader: adds a placeholder where it runs and loads the loader."""
+    return (
+        "(function(s){var d=document.createElement('div');"
+        f"d.setAttribute('data-rootme-badge','{int(id_auteur)}');s.parentNode.insertBefore(d,s);"
+        "var l=document.createElement('script');l.async=true;"
+        f"l.src='{loader_url(url)}';document.head.appendChild(l)}})(document.currentScript)"
+    ).encode()
+
+
+async def serve_loader(request: Request) -> Response:
+    version = loader_version()
+    etag = f'"{version}"'
+    cache = IMMUTABLE_CACHE_CONTROL if request.query_params.get("v") == version else cache_control()
+    headers = {"ETag": etag, "Cache-Control": cache}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=_loader(), media_type="text/javascript", headers=headers)
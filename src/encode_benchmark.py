@@ -0,0 +1,62 @@
+"""Bytes and encode time of a static badge in every output format.
+
+    python -m src.encode_benchmark [avatar_path] [-n 20]
+
+Compares Pillow's default PNG with the encodings the badges are stored in
+(optimized/palette PNG and the WebP/AVIF siblings), for each theme.
+"""
+import argparse
+import io
+import tempfile
+import time
+from typing import Callable, List, Tuple
+
+from PIL import Image, features
+
+from src.static_badge import ENCODE_OPTIONS, encode_image, get_available_themes, render_many
+
+SAMPLE_DATA = dict(name="g0blin", score=4242, rank="hacker", ranking=1337, ranking_tot=123456)
+
+
+def _default_png(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _encoders() -> List[Tuple[str, Callable[[Image.Image], bytes]]]:
+    encoders = [("png (pillow default)", _default_png)]
+    for fmt in ENCODE_OPTIONS:
+        if fmt == "png" or features.check(fmt):
+            encoders.append((fmt, lambda image, fmt=fmt: encode_image(image, fmt)))
+    return encoders
+
+
+def _sample_avatar() -> str:
+    path = tempfile.NamedTemporaryFile(suffix=".png", delete=False).name
+    Image.radial_gradient("L").resize((200, 200)).convert("RGB").save(path)
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m src.encode_benchmark", description=__doc__.splitlines()[0])
+    parser.add_argument("avatar", nargs="?", help="avatar image (a generated gradient by default)")
+    parser.add_argument("-n", "--repeat", type=int, default=20, help="encodes per format (default: 20)")
+    args = parser.parse_args()
+    avatar = args.avatar or _sample_avatar()
+
+    print(f"{'theme':<8}{'format':<22}{'bytes':>9}{'vs default':>12}{'encode ms':>12}")
+    for theme in get_available_themes():
+        _, _, image = next(render_many([dict(SAMPLE_DATA, avatar_path=avatar)], [theme]))
+        baseline = None
+        for name, encode in _encoders():
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                content = encode(image)
+            elapsed_ms = (time.perf_counter() - started) / args.repeat * 1000
+            baseline = baseline or len(content)
+            print(f"{theme:<8}{name:<22}{len(content):>9}{len(content) / baseline:>11.0%}{elapsed_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import asyncio
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from src.avatar_store import avatar_store
+from src.embed import badge_payload, legacy_script
+from src.http_client import AsyncRMAPI
+from src.parser import extract_data
+from src.refresh_scheduler import UserRecord, user_index
+from src.storage import badge_fingerprint, make_storage, make_storage_js, make_storage_json, stored_render_inputs
+
+
+async def fetch_user_data(rm_api: AsyncRMAPI, username: str, id_auteur: int) -> Dict:
+    auteurs_url = f"{rm_api.api_url}/auteurs/{id_auteur}"
+    content = await rm_api.http_get(auteurs_url)
+    if content is None:
+        return {
+            "nom": username,
+            "position": rm_api.number_users,
+            "score": 0,
+            "validations": [],
+        }
+    return json.loads(content)
+
+
+async def generate_badge(rm_api: AsyncRMAPI, data: Dict, id_auteur: int) -> Tuple[List[Dict[str, str]], Path]:
+    """Store the avatar, badges, embed data and badge.js for ``data`` and record the user in the index."""
+    url = os.environ.get("URL")
+
+    save_paths, folder_path, avatar_path, fingerprint = await make_storage(rm_api, data)
+    data["avatar_url"] = f"{url}/{avatar_path}"
+
+    make_storage_json(badge_payload(data), folder_path)
+    js_file_path = make_storage_js(legacy_script(url, id_auteur), folder_path)
+
+    if user_index.record_refresh(folder_path.name, data, id_auteur, fingerprint):
+        await asyncio.to_thread(user_index.flush)
+    return save_paths, js_file_path
+
+
+async def refresh_stored_user(rm_api: AsyncRMAPI, rec: UserRecord) -> bool:
+    """Re-render one stored user's badges; False when nothing they show has changed.
+
+    Users stored before render inputs were kept in the manifest are always re-rendered.
+    """
+    raw_data = await fetch_user_data(rm_api, rec.name, rec.id_auteur)
+    data = await extract_data(raw_data, rec.id_auteur, rm_api, os.environ.get("URL"))
+    avatar = await avatar_store.fetch(rm_api, data["avatar_url"])
+    unchanged = badge_fingerprint(data, avatar.sha256) == rec.fingerprint
+    if unchanged and await asyncio.to_thread(stored_render_inputs, rec.folder) is not None:
+        return False
+    await generate_badge(rm_api, data, rec.id_auteur)
+    return True
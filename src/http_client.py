@@ -1,22 +1,30 @@
+import asyncio
 import json
 import logging
 import os
 import random
+import sqlite3
 import threading
 import time
+from collections import OrderedDict
+from pathlib import Path
 from dataclasses import dataclass
+from functools import cached_property
 from datetime import datetime, timezone
 from email.utils import parsedate_to_datetime
-from typing import Dict, List, Optional, Tuple
-from urllib.parse import urlparse
+from typing import Callable, Dict, Generator, List, Mapping, Optional, Set, Tuple, TypeVar
+from urllib.parse import parse_qs, urlparse
 
-import requests
+import httpx
 from lxml import html
-from requests import Response, Session
-from requests.adapters import HTTPAdapter
+
+from src.rate_limiter import rate_limiter
+from src.shared_state import SharedDB, shared_db
 
 log = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
 
 
@@ -47,10 +55,10 @@ def _load_backoff_config() -> BackoffConfig:
     )
 
 
-def _sleep_backoff(attempt: int, base_sec: float, cap_sec: float) -> None:
+def _backoff_delay(attempt: int, base_sec: float, cap_sec: float) -> float:
     delay = min(cap_sec, base_sec * (2 ** attempt))
     jitter = random.uniform(0, max(delay * 0.1, 0.05))
-    time.sleep(delay + jitter)
+    return delay + jitter
 
 
 def _parse_retry_after(value: str, cap_sec: float) -> Optional[float]:
@@ -73,76 +81,56 @@ def _parse_retry_after(value: str, cap_sec: float) -> Optional[float]:
     return None
 
 
-def _sleep_for_retryable(response: Response, attempt: int, cfg: BackoffConfig) -> None:
-    if response.status_code == 429:
-        ra = response.headers.get("Retry-After")
+def _retryable_delay(status_code: int, headers: Mapping[str, str], attempt: int, cfg: BackoffConfig) -> float:
+    if status_code == 429:
+        ra = headers.get("Retry-After")
         parsed = _parse_retry_after(ra, cfg.cap_sec) if ra else None
         if parsed is not None:
             log.warning("http_retry_after", extra=dict(seconds=parsed, source="header"))
-            time.sleep(parsed)
-            return
+            return parsed
         base_429 = float(os.environ.get("HTTP_429_BACKOFF_BASE_SEC", "8.0"))
         delay = min(cfg.cap_sec, base_429 * (2 ** attempt) + random.uniform(0, 2.0))
         log.warning("http_429_backoff", extra=dict(seconds=delay, attempt=attempt))
-        time.sleep(delay)
-        return
-    _sleep_backoff(attempt, cfg.base_sec, cfg.cap_sec)
-
+        return delay
+    return _backoff_delay(attempt, cfg.base_sec, cfg.cap_sec)
 
-# ---------------------------------------------------------------------------
-# Request pacing (thread-safe via lock on instance)
-# ---------------------------------------------------------------------------
 
-class _RequestPacer:
-    def __init__(self) -> None:
-        self._lock = threading.Lock()
-        self._last_request_mono = 0.0
-
-    def wait(self) -> None:
-        interval = float(os.environ.get("ROOTME_MIN_REQUEST_INTERVAL_SEC", "0.35") or 0)
-        if interval <= 0:
-            return
-        with self._lock:
-            now = time.monotonic()
-            wait = interval - (now - self._last_request_mono)
-            if wait > 0:
-                time.sleep(wait)
-            self._last_request_mono = time.monotonic()
-
-
-_pacer = _RequestPacer()
+async def _observe_response_async(url: str, status_code: int, headers: Mapping[str, str], cfg: BackoffConfig) -> None:
+    ra = headers.get("Retry-After") if status_code == 429 else None
+    await rate_limiter.observe_async(url, status_code, _parse_retry_after(ra, cfg.cap_sec) if ra else None)
 
 
 # ---------------------------------------------------------------------------
 # Unified HTTP request with backoff
 # ---------------------------------------------------------------------------
 
-def _request_with_backoff(session: Session, method: str, url: str, **kwargs) -> Response:
+async def _async_request_with_backoff(client: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response:
     cfg = _load_backoff_config()
     kwargs.setdefault("timeout", cfg.timeout)
     last_exc: Optional[BaseException] = None
 
     for attempt in range(cfg.max_attempts):
         try:
-            _pacer.wait()
-            r = session.request(method, url, **kwargs)
-        except requests.exceptions.RequestException as exc:
+            await rate_limiter.acquire_async(url)
+            r = await client.request(method, url, **kwargs)
+        except httpx.TransportError as exc:
             last_exc = exc
             log.warning("http_request_retry", extra=dict(url=url, method=method, attempt=attempt, error=str(exc)))
             if attempt >= cfg.max_attempts - 1:
                 raise
-            _sleep_backoff(attempt, cfg.base_sec, cfg.cap_sec)
+            await asyncio.sleep(_backoff_delay(attempt, cfg.base_sec, cfg.cap_sec))
             continue
 
+        await _observe_response_async(url, r.status_code, r.headers, cfg)
         if r.status_code in RETRYABLE_STATUS and attempt < cfg.max_attempts - 1:
             log.warning("http_status_retry", extra=dict(url=url, method=method, attempt=attempt, status_code=r.status_code))
-            _sleep_for_retryable(r, attempt, cfg)
+            await asyncio.sleep(_retryable_delay(r.status_code, r.headers, attempt, cfg))
             continue
         return r
 
     if last_exc:
         raise last_exc
-    raise RuntimeError("_request_with_backoff: exhausted attempts without response")
+    raise RuntimeError("_async_request_with_backoff: exhausted attempts without response")
 
 
 # ---------------------------------------------------------------------------
@@ -168,14 +156,14 @@ def _load_proxy_pool() -> List[str]:
     return [u for part in raw.split(",") if (u := _normalize_proxy_entry(part))]
 
 
-def _pick_random_proxy() -> Optional[Dict[str, str]]:
+def _pick_random_proxy_url() -> Optional[str]:
     urls = _load_proxy_pool()
     if not urls:
         return None
     chosen = random.choice(urls)
     safe = chosen.split("@")[-1] if "@" in chosen else chosen
     log.info("proxy_selected", extra=dict(proxy=safe))
-    return {"http": chosen, "https": chosen}
+    return chosen
 
 
 # ---------------------------------------------------------------------------
@@ -189,29 +177,25 @@ def _api_hostname(api_url: str) -> str:
     return host
 
 
-def _set_cookie(session: Session, api_url: str, name: str, value: str) -> None:
+def _set_async_cookie(client: httpx.AsyncClient, api_url: str, name: str, value: str) -> None:
     if not value:
         return
     host = _api_hostname(api_url)
-    secure = api_url.lower().startswith("https")
-    session.cookies.set_cookie(
-        requests.cookies.create_cookie(domain=host, name=name, value=value, path="/", secure=secure)
-    )
+    client.cookies.set(name, value, domain=host, path="/")
     log.info(f"{name}_cookie_set", extra=dict(host=host))
 
 
-def _build_api_session(api_url: str) -> Session:
-    session = Session()
-    adapter = HTTPAdapter(max_retries=0, pool_maxsize=100, pool_block=True)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    session.headers["User-Agent"] = "curl/7.58.0"
-    proxies = _pick_random_proxy()
-    if proxies:
-        session.proxies.update(proxies)
+def _build_async_api_client(api_url: str) -> httpx.AsyncClient:
+    pool_size = int(os.environ.get("HTTP_POOL_MAX_CONNECTIONS", "100"))
+    client = httpx.AsyncClient(
+        headers={"User-Agent": "curl/7.58.0"},
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        proxy=_pick_random_proxy_url(),
+        follow_redirects=True,
+    )
     api_key = (os.environ.get("ROOTME_API_KEY") or "").strip()
-    _set_cookie(session, api_url, "api_key", api_key)
-    return session
+    _set_async_cookie(client, api_url, "api_key", api_key)
+    return client
 
 
 def _author_api_langs() -> List[str]:
@@ -219,13 +203,23 @@ def _author_api_langs() -> List[str]:
     return [x.strip() for x in raw.split(",") if x.strip()]
 
 
+def _select_score_ids(ids: List[int], limit: Optional[int], is_cached: Callable[[int], bool]) -> List[int]:
+    """Pick which author ids to score: every cached one, plus uncached ones up to ``limit``."""
+    ids = list(dict.fromkeys(ids))
+    if limit is None:
+        return ids
+    cached = [i for i in ids if is_cached(i)]
+    uncached = [i for i in ids if not is_cached(i)]
+    return cached + uncached[:max(0, limit - len(cached))]
+
+
 # ---------------------------------------------------------------------------
 # Low-level HTTP GET (returns bytes + status code)
 # ---------------------------------------------------------------------------
 
-def _http_get_raw(session: Session, url: str) -> Tuple[Optional[bytes], int]:
+async def _async_http_get_raw(client: httpx.AsyncClient, url: str) -> Tuple[Optional[bytes], int]:
     log.info("http_get", extra=dict(url=url))
-    r = _request_with_backoff(session, "GET", url)
+    r = await _async_request_with_backoff(client, "GET", url)
 
     if r.status_code in (200, 404, 401):
         level = "http_get_success" if r.status_code == 200 else "http_get_error"
@@ -235,146 +229,765 @@ def _http_get_raw(session: Session, url: str) -> Tuple[Optional[bytes], int]:
     raise HTTPBadStatusCodeError(r.status_code)
 
 
+@dataclass(frozen=True)
+class ConditionalResponse:
+    status_code: int
+    content: Optional[bytes]
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status_code == 304
+
+
+async def _async_conditional_get_raw(
+    client: httpx.AsyncClient, url: str, etag: Optional[str], last_modified: Optional[str]
+) -> ConditionalResponse:
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    log.info("http_get", extra=dict(url=url, conditional=bool(headers)))
+    r = await _async_request_with_backoff(client, "GET", url, headers=headers)
+
+    if r.status_code in (200, 304, 404, 401):
+        level = "http_get_success" if r.status_code in (200, 304) else "http_get_error"
+        log.info(level, extra=dict(url=url, status_code=r.status_code))
+        content = r.content if r.status_code == 200 else None
+        return ConditionalResponse(r.status_code, content, r.headers.get("etag"), r.headers.get("last-modified"))
+
+    raise HTTPBadStatusCodeError(r.status_code)
+
+
+# ---------------------------------------------------------------------------
+# Response cache (TTL + LRU, stale-while-revalidate)
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class CachePolicy:
+    ttl_sec: float
+    stale_sec: float
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    content: Optional[bytes]
+    fresh_until: float
+    stale_until: float
+
+    def is_fresh(self, now: float) -> bool:
+        return now < self.fresh_until
+
+    def is_usable(self, now: float) -> bool:
+        return now < self.stale_until
+
+
+# Endpoint kind -> (env var, default TTL). A TTL of 0 disables caching for that kind.
+_CACHE_TTL_DEFAULTS: Dict[str, Tuple[str, str]] = {
+    "search": ("HTTP_CACHE_TTL_SEARCH_SEC", "3600"),
+    "author": ("HTTP_CACHE_TTL_AUTHOR_SEC", "300"),
+    "profile": ("HTTP_CACHE_TTL_PROFILE_SEC", "900"),
+    "avatar": ("HTTP_CACHE_TTL_AVATAR_SEC", "86400"),
+}
+
+
+def _endpoint_kind(url: str) -> Optional[str]:
+    parsed = urlparse(url)
+    path = parsed.path.rstrip("/")
+    query = parse_qs(parsed.query)
+    # Stats crawls page through the listings and must always see live data.
+    if path.endswith("/challenges") or any(key.startswith("debut_") for key in query):
+        return None
+    if path.endswith("/auteurs"):
+        return "search" if "nom" in query else None
+    if "/auteurs/" in path:
+        return "author"
+    if "/IMG/" in path:
+        return "avatar"
+    return "profile"
+
+
+def _cache_policy(url: str) -> Optional[CachePolicy]:
+    kind = _endpoint_kind(url)
+    if kind is None:
+        return None
+    env_name, default = _CACHE_TTL_DEFAULTS[kind]
+    ttl = float(os.environ.get(env_name, default) or 0)
+    if ttl <= 0:
+        return None
+    stale = float(os.environ.get("HTTP_CACHE_STALE_SEC", "86400") or 0)
+    return CachePolicy(ttl_sec=ttl, stale_sec=max(0.0, stale))
+
+
+def _negative_cache_policy(policy: CachePolicy) -> Optional[CachePolicy]:
+    """Policy for a 404: briefly, and never stale, so a user created since then is found soon."""
+    ttl = min(policy.ttl_sec, float(os.environ.get("HTTP_CACHE_NEGATIVE_TTL_SEC", "60") or 0))
+    if ttl <= 0:
+        return None
+    return CachePolicy(ttl_sec=ttl, stale_sec=0.0)
+
+
+class ResponseCache:
+    """Bounded in-process LRU of GET responses keyed by URL.
+
+    Any object with the same ``get``/``set``/``stats`` methods can be passed to
+    :class:`AsyncRMAPI` instead; one with a true ``blocking`` attribute is
+    called from a thread.
+    """
+
+    blocking = False
+
+    def __init__(self, max_entries: Optional[int] = None) -> None:
+        if max_entries is None:
+            max_entries = int(os.environ.get("HTTP_CACHE_MAX_ENTRIES", "2048"))
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry.is_usable(now):
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if entry.is_fresh(now):
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+            return entry
+
+    def contains(self, key: str) -> bool:
+        """Whether ``key`` can be served from cache, without touching LRU order or counters."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry.is_usable(time.time())
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(
+                size=len(self._entries),
+                max_entries=self.max_entries,
+                hits=self.hits,
+                stale_hits=self.stale_hits,
+                misses=self.misses,
+                evictions=self.evictions,
+            )
+
+
+class SQLiteResponseCache:
+    """Same interface as :class:`ResponseCache`, stored in the shared SQLite database.
+
+    Every worker process reads and fills the same cache, and the counters
+    are shared too. Hits are plain reads: LRU touches and counter updates
+    are kept in memory and written in one transaction at most every
+    ``HTTP_CACHE_FLUSH_SEC`` (or with the next ``set``). A busy or broken
+    database falls back to an in-process :class:`ResponseCache`.
+    """
+
+    blocking = True
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS http_cache (
+            key TEXT PRIMARY KEY,
+            content BLOB,
+            fresh_until REAL NOT NULL,
+            stale_until REAL NOT NULL,
+            last_access REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS http_cache_lru ON http_cache (last_access);
+        CREATE TABLE IF NOT EXISTS http_cache_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, db: SharedDB, max_entries: Optional[int] = None) -> None:
+        if max_entries is None:
+            max_entries = int(os.environ.get("HTTP_CACHE_MAX_ENTRIES", "2048"))
+        self.max_entries = max_entries
+        self.flush_sec = float(os.environ.get("HTTP_CACHE_FLUSH_SEC", "5"))
+        self._db = db
+        self._fallback = ResponseCache(max_entries)
+        self._pending_lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._counters: Dict[str, int] = {}
+        self._flushed_at = time.time()
+        self._degraded = False
+        db.ensure_schema(self._SCHEMA)
+
+    def _db_failed(self, err: sqlite3.OperationalError) -> None:
+        if not self._degraded:
+            self._degraded = True
+            log.warning("http_cache_shared_state_unavailable", extra=dict(error=str(err)))
+
+    def _count(self, name: str) -> None:
+        with self._pending_lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+
+    def _take_pending(self) -> Tuple[Dict[str, float], Dict[str, int]]:
+        with self._pending_lock:
+            touched, counters = self._touched, self._counters
+            self._touched, self._counters = {}, {}
+            self._flushed_at = time.time()
+        return touched, counters
+
+    def _restore_pending(self, touched: Dict[str, float], counters: Dict[str, int]) -> None:
+        with self._pending_lock:
+            for key, at in touched.items():
+                self._touched[key] = max(at, self._touched.get(key, 0.0))
+            for name, value in counters.items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def _write_pending(self, conn, touched: Dict[str, float], counters: Dict[str, int]) -> None:
+        conn.executemany("UPDATE http_cache SET last_access = ? WHERE key = ?", [(t, k) for k, t in touched.items()])
+        conn.executemany(
+            "INSERT INTO http_cache_counters VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            list(counters.items()),
+        )
+
+    def flush(self) -> None:
+        """Write the pending LRU touches and counters."""
+        touched, counters = self._take_pending()
+        if not touched and not counters:
+            return
+        try:
+            with self._db.transaction() as conn:
+                self._write_pending(conn, touched, counters)
+        except sqlite3.OperationalError as err:
+            self._db_failed(err)
+            self._restore_pending(touched, counters)
+
+    def _maybe_flush(self) -> None:
+        if time.time() - self._flushed_at >= self.flush_sec:
+            self.flush()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        now = time.time()
+        try:
+            with self._db.reader() as conn:
+                row = conn.execute(
+                    "SELECT content, fresh_until, stale_until FROM http_cache WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.OperationalError as err:
+            self._db_failed(err)
+            return self._fallback.get(key)
+        self._degraded = False
+        entry = CacheEntry(*row) if row else None
+        if entry is None or not entry.is_usable(now):
+            # Expired rows are left for set() to overwrite or evict.
+            self._count("misses")
+            entry = None
+        else:
+            with self._pending_lock:
+                self._touched[key] = now
+            self._count("hits" if entry.is_fresh(now) else "stale_hits")
+        self._maybe_flush()
+        return entry
+
+    def contains(self, key: str) -> bool:
+        try:
+            with self._db.reader() as conn:
+                row = conn.execute("SELECT stale_until FROM http_cache WHERE key = ?", (key,)).fetchone()
+        except sqlite3.OperationalError as err:
+            self._db_failed(err)
+            return self._fallback.contains(key)
+        return row is not None and time.time() < row[0]
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        if self.max_entries <= 0:
+            return
+        touched, counters = self._take_pending()
+        try:
+            with self._db.transaction() as conn:
+                self._write_pending(conn, touched, counters)
+                conn.execute(
+                    "INSERT OR REPLACE INTO http_cache VALUES (?, ?, ?, ?, ?)",
+                    (key, entry.content, entry.fresh_until, entry.stale_until, time.time()),
+                )
+                (size,) = conn.execute("SELECT COUNT(*) FROM http_cache").fetchone()
+                overflow = size - self.max_entries
+                if overflow > 0:
+                    conn.execute(
+                        "DELETE FROM http_cache WHERE key IN "
+                        "(SELECT key FROM http_cache ORDER BY last_access LIMIT ?)",
+                        (overflow,),
+                    )
+                    conn.execute(
+                        "INSERT INTO http_cache_counters VALUES ('evictions', ?) "
+                        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                        (overflow,),
+                    )
+        except sqlite3.OperationalError as err:
+            self._db_failed(err)
+            self._restore_pending(touched, counters)
+            self._fallback.set(key, entry)
+
+    def stats(self) -> Dict[str, int]:
+        self.flush()
+        try:
+            with self._db.reader() as conn:
+                (size,) = conn.execute("SELECT COUNT(*) FROM http_cache").fetchone()
+                counters = dict(conn.execute("SELECT name, value FROM http_cache_counters").fetchall())
+        except sqlite3.OperationalError as err:
+            self._db_failed(err)
+            return self._fallback.stats()
+        return dict(
+            size=size,
+            max_entries=self.max_entries,
+            hits=counters.get("hits", 0),
+            stale_hits=counters.get("stale_hits", 0),
+            misses=counters.get("misses", 0),
+            evictions=counters.get("evictions", 0),
+        )
+
+
+def _make_cache_entry(content: Optional[bytes], policy: CachePolicy) -> CacheEntry:
+    now = time.time()
+    fresh_until = now + policy.ttl_sec
+    return CacheEntry(content=content, fresh_until=fresh_until, stale_until=fresh_until + policy.stale_sec)
+
+
+def _make_response_cache():
+    db = shared_db()
+    return SQLiteResponseCache(db) if db is not None else ResponseCache()
+
+
+response_cache = _make_response_cache()
+
+
 # ---------------------------------------------------------------------------
-# RMAPI — Root-Me API client
+# Response parsing used by AsyncRMAPI
 # ---------------------------------------------------------------------------
 
-class RMAPI:
-    def __init__(self) -> None:
+def _login_spip_session(content: bytes) -> str:
+    return str(json.loads(content)[0]["info"]["spip_session"])
+
+
+def _author_page_entries(content: Optional[bytes]) -> List[dict]:
+    if content is None:
+        return []
+    data = json.loads(content)[0]
+    return [data[key] for key in sorted(data, key=int)]
+
+
+def _is_exact_unique_match(content: Optional[bytes], username: str) -> bool:
+    entries = _author_page_entries(content)
+    return len(entries) == 1 and entries[0].get("nom") == username
+
+
+def _merge_author_pages(pages: List[Optional[bytes]]) -> Optional[dict]:
+    """Merge per-lang /auteurs?nom= results, keeping one entry per id_auteur."""
+    result = {}
+    seen = set()
+    for content in pages:
+        for entry in _author_page_entries(content):
+            id_auteur = str(entry.get("id_auteur"))
+            if id_auteur in seen:
+                continue
+            seen.add(id_auteur)
+            result[str(len(result))] = entry
+    return result or None
+
+
+def _profile_url_candidates(api_url: str, username: str, id_user: int) -> List[str]:
+    normalized = username.replace(" ", "-") if " " in username else username
+    return [f"{api_url}/{username}-{id_user}", f"{api_url}/{normalized}"]
+
+
+def _parse_search_results(api_url: str, content: bytes, username: str) -> str:
+    tree = html.fromstring(content)
+    urls = tree.xpath(
+        f'//div[@class="t-body tb-padding"]/ul/li/a[contains(text(), "{username}")]/@href'
+    )
+    if len(urls) == 1:
+        return api_url + urls[0]
+    raise Exception("Update method to find profile page url")
+
+
+def _parse_avatar_url(api_url: str, tree: html.HtmlElement, profile_page_url: str) -> str:
+    for xpath in (
+        '//h1/img[@itemprop="image"]/@src',
+        '//img[starts-with(@src, "IMG/logo/auton")]/@src',
+    ):
+        result = tree.xpath(xpath)
+        if result:
+            return f"{api_url}/{result[0]}"
+    raise ValueError(f"Avatar not found on {profile_page_url}")
+
+
+def _parse_rank(tree: html.HtmlElement) -> str:
+    results = tree.xpath('//img[starts-with(@src, "squelettes/img/rang")]/@title')
+    if not results or not results[0].strip():
+        return "visitor"
+    return results[0].strip()
+
+
+class ProfileSnapshot:
+    """A profile page fetched once; the HTML is parsed on first attribute access."""
+
+    def __init__(self, api_url: str, url: str, content: bytes) -> None:
+        self.api_url = api_url
+        self.url = url
+        self.content = content
+
+    @cached_property
+    def tree(self) -> html.HtmlElement:
+        return html.fromstring(self.content)
+
+    @cached_property
+    def avatar_url(self) -> str:
+        return _parse_avatar_url(self.api_url, self.tree, self.url)
+
+    @cached_property
+    def rank(self) -> str:
+        return _parse_rank(self.tree)
+
+
+# ---------------------------------------------------------------------------
+# Site stats: persisted snapshot and user count search
+# ---------------------------------------------------------------------------
+
+LISTING_PAGE_SIZE = 50
+
+
+def _stats_snapshot_path() -> Path:
+    default = Path(os.environ.get("STORAGE_FOLDER", "storage_clients")) / ".rootme_stats.json"
+    return Path(os.environ.get("ROOTME_STATS_FILE") or default)
+
+
+def load_stats_snapshot() -> Dict:
+    try:
+        return json.loads(_stats_snapshot_path().read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def save_stats_snapshot(**values: int) -> None:
+    path = _stats_snapshot_path()
+    snapshot = load_stats_snapshot()
+    for key, value in values.items():
+        snapshot[key] = value
+        snapshot[f"{key}_at"] = time.time()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(snapshot))
+        tmp.replace(path)
+    except OSError:
+        log.warning("stats_snapshot_write_failed", extra=dict(path=str(path)))
+
+
+def _snapshot_is_fresh(snapshot: Dict, key: str) -> bool:
+    max_age = float(os.environ.get("ROOTME_STATS_MAX_AGE_SEC", str(24 * 60 * 60)))
+    return key in snapshot and time.time() - snapshot.get(f"{key}_at", 0) < max_age
+
+
+def _listing_count_search(hint: int) -> Generator[int, Tuple[int, bool], int]:
+    """Find the length of a paginated listing with one request per step.
+
+    Yields ``debut_*`` offsets and receives ``(items on that page, is last
+    page)``. A partial or last page gives the answer directly; otherwise the
+    search gallops outward from ``hint`` until the total is bracketed, then
+    bisects.
+    """
+    page = LISTING_PAGE_SIZE
+    lo, hi = 0, None  # lo <= total, and total <= hi once hi is known
+    offset = max(0, hint - hint % page)
+    step = page
+    while hi is None or lo < hi:
+        n, last = yield offset
+        if 0 < n < page or (last and n > 0):
+            return offset + n
+        if n >= page:
+            lo = max(lo, offset + page)
+        else:
+            hi = offset if hi is None else min(hi, offset)
+        if hi is None:
+            offset, step = lo + step, step * 2
+        elif lo == 0 and offset == hi and hi > page and step <= hi:
+            offset, step = hi - step, step * 2
+        else:
+            offset = lo + max(0, (hi - lo) // 2 - page // 2)
+            offset = min(offset, max(lo, hi - page))
+    return lo
+
+
+def _listing_page(data: Optional[list], detect_last: bool = False) -> Tuple[int, bool]:
+    """Items on a listing page, and whether its links say it is the last one."""
+    if not data or not isinstance(data[0], dict):
+        return 0, False
+    last = detect_last and len(data) > 1 and data[-1].get("rel") == "previous"
+    return len(data[0]), last
+
+
+# ---------------------------------------------------------------------------
+# AsyncRMAPI — asyncio Root-Me API client used on the request path
+# ---------------------------------------------------------------------------
+
+class AsyncRMAPI:
+    """Root-Me API client, backed by a pooled ``httpx.AsyncClient``.
+
+    Build it with :meth:`create`, or construct it and await :meth:`start`
+    (which authenticates and loads the stats); close it with :meth:`aclose`.
+    """
+
+    def __init__(self, cache: Optional[ResponseCache] = None) -> None:
         self.api_url: str = os.environ["API_URL"]
         self.web_url: str = self.api_url.replace("api.", "")
         self.number_challenges: Optional[int] = None
         self.number_users: Optional[int] = None
-        self.session = _build_api_session(self.api_url)
+        self.cache = cache if cache is not None else response_cache
+        self.client = _build_async_api_client(self.api_url)
         self._username = os.environ.get("ROOTME_ACCOUNT_USERNAME")
         self._password = os.environ.get("ROOTME_ACCOUNT_PASSWORD")
-        self._authenticate()
-        self.update_number_rootme_challenges()
-        self.update_number_rootme_users()
+        self._auth_lock = asyncio.Lock()
+        self._inflight: Dict[str, "asyncio.Task[Optional[bytes]]"] = {}
+        self._background: Set["asyncio.Task"] = set()
+
+    @classmethod
+    async def create(cls, cache: Optional[ResponseCache] = None) -> "AsyncRMAPI":
+        api = cls(cache=cache)
+        try:
+            await api.start()
+        except BaseException:
+            await api.aclose()
+            raise
+        return api
+
+    async def start(self) -> None:
+        await self._authenticate()
+        await self._load_stats()
+
+    def _seed_stats(self) -> List[str]:
+        """Load the counts from the snapshot and return the ones that are missing or stale."""
+        snapshot = load_stats_snapshot()
+        self.number_challenges = snapshot.get("number_challenges")
+        self.number_users = snapshot.get("number_users")
+        return [key for key in ("number_challenges", "number_users") if not _snapshot_is_fresh(snapshot, key)]
+
+    async def _load_stats(self) -> None:
+        # Counts with no snapshot at all are needed before serving; stale ones
+        # keep serving the snapshot value while they refresh in the background.
+        refreshers = dict(
+            number_challenges=self.update_number_rootme_challenges,
+            number_users=self.update_number_rootme_users,
+        )
+        for key in self._seed_stats():
+            if getattr(self, key) is None:
+                await refreshers[key]()
+            else:
+                self._spawn(refreshers[key]())
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._on_background_done)
+
+    def _on_background_done(self, task: "asyncio.Task") -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.warning("background_refresh_failed", extra=dict(error=str(task.exception())))
+
+    async def aclose(self) -> None:
+        for task in [*self._inflight.values(), *self._background]:
+            task.cancel()
+        if hasattr(self.cache, "flush"):
+            await self._cache_call(self.cache.flush)
+        await self.client.aclose()
 
     # -- Authentication -----------------------------------------------------
 
-    def _authenticate(self) -> None:
+    async def _authenticate(self) -> None:
         url = f"{self.api_url}/login"
         payload = {"login": self._username, "password": self._password}
         log.info("http_post", extra=dict(url=url))
-        r = _request_with_backoff(self.session, "POST", url, data=payload)
+        r = await _async_request_with_backoff(self.client, "POST", url, data=payload)
 
         if r.status_code != 200:
             log.info("authentication_failed", extra=dict(url=url, status_code=r.status_code))
             raise HTTPBadStatusCodeError(r.status_code)
 
         log.info("authentication_successful", extra=dict(url=url))
-        spip_session = json.loads(r.content)[0]["info"]["spip_session"]
-        _set_cookie(self.session, self.api_url, "spip_session", str(spip_session))
+        _set_async_cookie(self.client, self.api_url, "spip_session", _login_spip_session(r.content))
+
+    async def _reauthenticate(self, stale_session: Optional[str]) -> None:
+        # Concurrent 401s share a single re-login instead of each posting /login.
+        async with self._auth_lock:
+            if self.client.cookies.get("spip_session") == stale_session:
+                await self._authenticate()
 
     # -- Core HTTP ----------------------------------------------------------
 
-    def http_get(self, url: str) -> Optional[bytes]:
-        content, status_code = _http_get_raw(self.session, url)
+    async def _fetch_raw(self, url: str) -> Tuple[Optional[bytes], int]:
+        session_before = self.client.cookies.get("spip_session")
+        content, status_code = await _async_http_get_raw(self.client, url)
         if status_code == 401:
-            self._authenticate()
-            content, _ = _http_get_raw(self.session, url)
+            await self._reauthenticate(session_before)
+            content, status_code = await _async_http_get_raw(self.client, url)
+        return content, status_code
+
+    async def _fetch(self, url: str) -> Optional[bytes]:
+        content, _ = await self._fetch_raw(url)
+        return content
+
+    async def _cache_call(self, fn: Callable[..., T], *args) -> T:
+        # The shared SQLite cache may wait on other workers: keep it off the event loop.
+        if getattr(self.cache, "blocking", False):
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def _fetch_and_store(self, url: str, policy: CachePolicy) -> Optional[bytes]:
+        content, status_code = await self._fetch_raw(url)
+        if status_code != 200:
+            # A 401 left after re-authenticating is not an answer about the resource.
+            policy = _negative_cache_policy(policy) if status_code == 404 else None
+        if policy is not None:
+            await self._cache_call(self.cache.set, url, _make_cache_entry(content, policy))
         return content
 
-    def _get_json(self, url: str) -> Optional[dict]:
-        content = self.http_get(url)
+    def _start_fetch(self, url: str, policy: CachePolicy) -> "asyncio.Task[Optional[bytes]]":
+        # Concurrent misses for the same URL share one upstream request, which
+        # runs detached so a cancelled caller does not abort it for the others.
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.create_task(self._fetch_and_store(url, policy))
+            self._inflight[url] = task
+            task.add_done_callback(lambda t: self._on_fetch_done(url, t))
+        return task
+
+    def _on_fetch_done(self, url: str, task: "asyncio.Task[Optional[bytes]]") -> None:
+        self._inflight.pop(url, None)
+        if not task.cancelled() and task.exception() is not None:
+            log.warning("http_cache_fetch_failed", extra=dict(url=url, error=str(task.exception())))
+
+    async def http_get(self, url: str) -> Optional[bytes]:
+        policy = _cache_policy(url)
+        if policy is None:
+            return await self._fetch(url)
+        entry = await self._cache_call(self.cache.get, url)
+        if entry is None:
+            return await asyncio.shield(self._start_fetch(url, policy))
+        if not entry.is_fresh(time.time()):
+            self._start_fetch(url, policy)
+        return entry.content
+
+    async def conditional_get(
+        self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None
+    ) -> ConditionalResponse:
+        """Uncached GET revalidating a copy the caller keeps; a 304 comes back without content."""
+        session_before = self.client.cookies.get("spip_session")
+        response = await _async_conditional_get_raw(self.client, url, etag, last_modified)
+        if response.status_code == 401:
+            await self._reauthenticate(session_before)
+            response = await _async_conditional_get_raw(self.client, url, etag, last_modified)
+        return response
+
+    async def _get_json(self, url: str) -> Optional[dict]:
+        content = await self.http_get(url)
         if content is None:
             return None
         return json.loads(content)
 
     # -- Stats refresh ------------------------------------------------------
 
-    def update_number_rootme_challenges(self) -> None:
-        count = 0
-        while True:
-            url = f"{self.api_url}/challenges" + (f"?debut_challenges={count}" if count else "")
-            data = self._get_json(url)
-            if data[-1]["rel"] == "previous":
-                break
-            count += 50
-        self.number_challenges = count + len(data[0])
-
-    def update_number_rootme_users(self, mini: int = 0, maxi: int = 10 ** 6) -> None:
-        count = (mini + maxi) // 2 + 1
-
-        data = self._get_json(f"{self.api_url}/auteurs?debut_auteurs={count}")
-        data_prev = self._get_json(f"{self.api_url}/auteurs?debut_auteurs={count - 1}")
-
-        if abs(len(data_prev[0]) - len(data[0])) == 1 or abs(maxi - mini) < 5:
-            self.number_users = count + len(data[0])
-            return
-
-        if len(data[0]) < 50:
-            self.update_number_rootme_users(mini=mini, maxi=count + 1)
-        else:
-            self.update_number_rootme_users(mini=count - 1, maxi=maxi)
+    async def _count_listing(self, path: str, param: str, hint: int, detect_last: bool = False) -> int:
+        search = _listing_count_search(hint)
+        offset = next(search)
+        try:
+            while True:
+                data = await self._get_json(f"{self.api_url}/{path}?{param}={offset}")
+                offset = search.send(_listing_page(data, detect_last))
+        except StopIteration as done:
+            return done.value
+
+    async def update_number_rootme_challenges(self) -> None:
+        hint = self.number_challenges or load_stats_snapshot().get("number_challenges", 0)
+        self.number_challenges = await self._count_listing("challenges", "debut_challenges", hint, detect_last=True)
+        save_stats_snapshot(number_challenges=self.number_challenges)
+
+    async def update_number_rootme_users(self) -> None:
+        hint = self.number_users or load_stats_snapshot().get("number_users", 0)
+        self.number_users = await self._count_listing("auteurs", "debut_auteurs", hint)
+        save_stats_snapshot(number_users=self.number_users)
 
     # -- User data ----------------------------------------------------------
 
-    def get_user_info(self, username: str) -> Optional[dict]:
-        result = {}
-        for lang in _author_api_langs():
-            url = f"{self.api_url}/auteurs?nom={username}&lang={lang}"
-            content = self.http_get(url)
-            if content is None:
-                continue
-            data = json.loads(content)[0]
-            offset = len(result)
-            for key in data:
-                result[str(offset + int(key))] = data[key]
-        return result or None
+    async def get_user_info(self, username: str) -> Optional[dict]:
+        # The first lang is fetched alone: when it already resolves to a single exact
+        # match the others are never requested, saving their rate-limit budget.
+        urls = [f"{self.api_url}/auteurs?nom={username}&lang={lang}" for lang in _author_api_langs()]
+        if not urls:
+            return None
+        first = await self.http_get(urls[0])
+        if _is_exact_unique_match(first, username):
+            return _merge_author_pages([first])
+        others = await asyncio.gather(*(self.http_get(url) for url in urls[1:]))
+        return _merge_author_pages([first, *others])
 
-    def get_user_data(self, id_user: int) -> Optional[dict]:
-        return self._get_json(f"{self.api_url}/auteurs/{id_user}")
+    async def get_user_data(self, id_user: int) -> Optional[dict]:
+        return await self._get_json(f"{self.api_url}/auteurs/{id_user}")
 
-    def get_score(self, id_user: int) -> int:
-        data = self.get_user_data(id_user)
+    async def get_score(self, id_user: int) -> int:
+        data = await self.get_user_data(id_user)
         if data is None:
             return 0
         return int(data["score"])
 
+    async def get_scores(self, ids: List[int], limit: Optional[int] = None) -> Dict[int, int]:
+        """Scores for many authors fetched in parallel under the rate limiter.
+
+        With ``limit``, cached records are always used but at most ``limit``
+        ids are scored in total; the others are left out of the result.
+        """
+        def is_cached(id_user: int) -> bool:
+            return self.cache.contains(f"{self.api_url}/auteurs/{id_user}")
+
+        selected = await self._cache_call(_select_score_ids, ids, limit, is_cached)
+        scores = await asyncio.gather(*(self.get_score(id_user) for id_user in selected))
+        return dict(zip(selected, scores))
+
     # -- Profile page scraping ----------------------------------------------
 
-    def get_profile_page_url(self, username: str, id_user: int) -> Optional[str]:
-        url = f"{self.api_url}/{username}-{id_user}"
-        if self.http_get(url) is not None:
-            return url
+    async def get_profile_snapshot(self, username: str, id_user: int) -> ProfileSnapshot:
+        for url in _profile_url_candidates(self.api_url, username, id_user):
+            content = await self.http_get(url)
+            if content is not None:
+                return ProfileSnapshot(self.api_url, url, content)
+        return await self._snapshot(await self._search_profile_page(username))
 
-        normalized = username.replace(" ", "-") if " " in username else username
-        url = f"{self.api_url}/{normalized}"
-        if self.http_get(url) is not None:
-            return url
+    async def _snapshot(self, profile_page_url: str) -> ProfileSnapshot:
+        return ProfileSnapshot(self.api_url, profile_page_url, await self.http_get(profile_page_url))
 
-        return self._search_profile_page(username)
+    async def get_profile_page_url(self, username: str, id_user: int) -> Optional[str]:
+        return (await self.get_profile_snapshot(username, id_user)).url
 
-    def _search_profile_page(self, username: str) -> str:
+    async def _search_profile_page(self, username: str) -> str:
         url = f"{self.web_url}/?page=recherche&recherche={username}"
-        content = self.http_get(url)
-        tree = html.fromstring(content)
-        urls = tree.xpath(
-            f'//div[@class="t-body tb-padding"]/ul/li/a[contains(text(), "{username}")]/@href'
-        )
-        if len(urls) == 1:
-            return self.api_url + urls[0]
-        raise Exception("Update method to find profile page url")
-
-    def get_avatar_url(self, profile_page_url: str) -> str:
-        content = self.http_get(profile_page_url)
-        tree = html.fromstring(content)
-        for xpath in (
-            '//h1/img[@itemprop="image"]/@src',
-            '//img[starts-with(@src, "IMG/logo/auton")]/@src',
-        ):
-            result = tree.xpath(xpath)
-            if result:
-                return f"{self.api_url}/{result[0]}"
-        raise ValueError(f"Avatar not found on {profile_page_url}")
-
-    def get_rank(self, profile_page_url: str) -> str:
-        content = self.http_get(profile_page_url)
-        tree = html.fromstring(content)
-        results = tree.xpath('//img[starts-with(@src, "squelettes/img/rang")]/@title')
-        if not results or not results[0].strip():
-            return "visitor"
-        return results[0].strip()
+        return _parse_search_results(self.api_url, await self.http_get(url), username)
+
+    async def get_avatar_url(self, profile_page_url: str) -> str:
+        return (await self._snapshot(profile_page_url)).avatar_url
+
+    async def get_rank(self, profile_page_url: str) -> str:
+        return (await self._snapshot(profile_page_url)).rank
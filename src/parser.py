@@ -1,19 +1,20 @@
+import os
 import re
 from typing import Dict, List, Optional, Tuple
 
-from src.http_client import RMAPI
+from src.http_client import AsyncRMAPI
 
 
-def _find_user_id_from_suffix(username: str, api: RMAPI) -> Tuple[Optional[str], Optional[int], Optional[str], Optional[str]]:
+async def _find_user_id_from_suffix(username: str, api: AsyncRMAPI) -> Tuple[Optional[str], Optional[int], Optional[str], Optional[str]]:
     """Handle usernames like 'alice-12345' where the suffix is the author ID."""
     id_auteur = int(re.findall(r"-(\d+)$", username)[0])
     real_username = "-".join(username.split("-")[:-1])
 
-    data = api.get_user_data(id_auteur)
+    data = await api.get_user_data(id_auteur)
     if data is not None and data["nom"] != real_username:
         return None, None, f"{username} is not a valid RootMe username.", "error"
 
-    user_info = api.get_user_info(real_username)
+    user_info = await api.get_user_info(real_username)
     if user_info is None:
         return None, None, f"{username} is not a valid RootMe username.", "error"
 
@@ -24,12 +25,21 @@ def _find_user_id_from_suffix(username: str, api: RMAPI) -> Tuple[Optional[str],
     return real_username, id_auteur, None, None
 
 
+def _disambiguation_score_limit() -> Optional[int]:
+    raw = os.environ.get("ROOTME_DISAMBIGUATION_MAX_SCORES", "10").strip()
+    limit = int(raw) if raw else 0
+    return limit if limit > 0 else None
+
+
+def _format_disambiguation_item(user: Dict) -> str:
+    if user["score"] is None:
+        return f'<li>{user["username_select"]}</li>'
+    return f'<li>{user["username_select"]} (Score = {user["score"]} point(s))</li>'
+
+
 def _build_disambiguation_message(users: List[Dict]) -> str:
-    users = sorted(users, key=lambda u: u["score"], reverse=True)
-    items = "".join(
-        f'<li>{u["username_select"]} (Score = {u["score"]} point(s))</li>'
-        for u in users
-    )
+    users = sorted(users, key=lambda u: (u["score"] is not None, u["score"] or 0), reverse=True)
+    items = "".join(_format_disambiguation_item(u) for u in users)
     return (
         '<div style="text-align: left">'
         "Several users exists from this username.<br>"
@@ -38,17 +48,19 @@ def _build_disambiguation_message(users: List[Dict]) -> str:
     )
 
 
-def _find_user_id_by_name(username: str, api: RMAPI) -> Tuple[Optional[str], Optional[int], Optional[str], Optional[str]]:
+async def _find_user_id_by_name(username: str, api: AsyncRMAPI) -> Tuple[Optional[str], Optional[int], Optional[str], Optional[str]]:
     """Handle plain usernames — may match multiple accounts."""
-    user_info = api.get_user_info(username)
+    user_info = await api.get_user_info(username)
     if user_info is None:
         return None, None, f"{username} is not a valid RootMe username.", "error"
 
     if len(user_info) > 1:
+        ids = [int(user_info[key]["id_auteur"]) for key in user_info]
+        scores = await api.get_scores(ids, limit=_disambiguation_score_limit())
         users = [
             {
                 "username_select": f'{user_info[key]["nom"]}-{user_info[key]["id_auteur"]}',
-                "score": api.get_score(int(user_info[key]["id_auteur"])),
+                "score": scores.get(int(user_info[key]["id_auteur"])),
             }
             for key in user_info
         ]
@@ -59,16 +71,16 @@ def _find_user_id_by_name(username: str, api: RMAPI) -> Tuple[Optional[str], Opt
     return username, entry["id_auteur"], None, None
 
 
-def extract_info_username_input(
-    username: str, api: RMAPI
+async def extract_info_username_input(
+    username: str, api: AsyncRMAPI
 ) -> Tuple[Optional[str], Optional[int], Optional[str], Optional[str]]:
     has_id_suffix = re.search(r"-(\d+)$", username)
     if has_id_suffix:
-        return _find_user_id_from_suffix(username, api)
-    return _find_user_id_by_name(username, api)
+        return await _find_user_id_from_suffix(username, api)
+    return await _find_user_id_by_name(username, api)
 
 
-def extract_data(data: Dict, id_auteur: int, api: RMAPI, url: str) -> Dict:
+async def extract_data(data: Dict, id_auteur: int, api: AsyncRMAPI, url: str) -> Dict:
     nu = api.number_users
     if nu is None or nu < 1:
         raise ValueError(
@@ -81,15 +93,15 @@ def extract_data(data: Dict, id_auteur: int, api: RMAPI, url: str) -> Dict:
     top = _compute_top_percentage(position, nu)
 
     username = data["nom"]
-    profile_page_url = api.get_profile_page_url(username, id_auteur)
+    profile = await api.get_profile_snapshot(username, id_auteur)
 
     return {
         "url": url,
         "name": username,
         "fullname": f"{username}-{id_auteur}",
-        "avatar_url": api.get_avatar_url(profile_page_url),
+        "avatar_url": profile.avatar_url,
         "score": score,
-        "rank": api.get_rank(profile_page_url),
+        "rank": profile.rank,
         "ranking": position,
         "ranking_tot": nu,
         "top": f"{top:.2f}%",
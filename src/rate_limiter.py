@@ -0,0 +1,290 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import astuple, dataclass
+from typing import Callable, Dict, Optional, TypeVar
+from urllib.parse import urlparse
+
+from src.shared_state import SharedDB, shared_db
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class BucketConfig:
+    rate_per_sec: float
+    burst: float
+    min_factor: float
+    recovery: float
+
+
+def _default_rate() -> float:
+    interval = float(os.environ.get("ROOTME_MIN_REQUEST_INTERVAL_SEC", "0.35") or 0)
+    return 1 / interval if interval > 0 else 0.0
+
+
+def _host_overrides() -> Dict[str, str]:
+    """Parse ROOTME_RATE_LIMIT_HOSTS, e.g. ``api.www.root-me.org=3:1,www.root-me.org=1:2`` (rate:burst)."""
+    raw = (os.environ.get("ROOTME_RATE_LIMIT_HOSTS") or "").strip()
+    overrides = {}
+    for part in raw.split(","):
+        host, sep, spec = part.strip().partition("=")
+        if sep and host and spec:
+            overrides[host.strip().lower()] = spec.strip()
+    return overrides
+
+
+def _load_bucket_config(host: str) -> BucketConfig:
+    rate = _default_rate()
+    burst = float(os.environ.get("ROOTME_RATE_LIMIT_BURST", "1") or 1)
+    spec = _host_overrides().get(host)
+    if spec:
+        rate_raw, _, burst_raw = spec.partition(":")
+        rate = float(rate_raw)
+        if burst_raw:
+            burst = float(burst_raw)
+    return BucketConfig(
+        rate_per_sec=rate,
+        burst=max(1.0, burst),
+        min_factor=float(os.environ.get("ROOTME_RATE_LIMIT_MIN_FACTOR", "0.1")),
+        recovery=float(os.environ.get("ROOTME_RATE_LIMIT_RECOVERY", "1.05")),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Bucket state stores
+# ---------------------------------------------------------------------------
+
+@dataclass
+class BucketState:
+    tokens: float
+    updated: float
+    blocked_until: float = 0.0
+    factor: float = 1.0
+
+
+class _LocalBucketStore:
+    """Bucket states for this process only."""
+
+    blocking = False
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._states: Dict[str, BucketState] = {}
+
+    def update(self, host: str, initial: Callable[[], BucketState], fn: Callable[[BucketState], T]) -> T:
+        with self._lock:
+            state = self._states.get(host)
+            if state is None:
+                state = self._states[host] = initial()
+            return fn(state)
+
+
+class _SQLiteBucketStore:
+    """Bucket states in the shared database, so every worker draws from one budget.
+
+    A busy or broken database falls back to a per-process bucket instead
+    of failing the request.
+    """
+
+    blocking = True
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS rate_buckets (
+            host TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated REAL NOT NULL,
+            blocked_until REAL NOT NULL,
+            factor REAL NOT NULL
+        );
+    """
+
+    def __init__(self, db: SharedDB) -> None:
+        self._db = db
+        self._fallback = _LocalBucketStore()
+        self._degraded = False
+        db.ensure_schema(self._SCHEMA)
+
+    def update(self, host: str, initial: Callable[[], BucketState], fn: Callable[[BucketState], T]) -> T:
+        try:
+            with self._db.transaction() as conn:
+                row = conn.execute(
+                    "SELECT tokens, updated, blocked_until, factor FROM rate_buckets WHERE host = ?", (host,)
+                ).fetchone()
+                state = BucketState(*row) if row else initial()
+                result = fn(state)
+                conn.execute("INSERT OR REPLACE INTO rate_buckets VALUES (?, ?, ?, ?, ?)", (host, *astuple(state)))
+        except sqlite3.OperationalError as err:
+            if not self._degraded:
+                self._degraded = True
+                log.warning("rate_limit_shared_state_unavailable", extra=dict(host=host, error=str(err)))
+            return self._fallback.update(host, initial, fn)
+        self._degraded = False
+        return result
+
+
+def _make_bucket_store():
+    db = shared_db()
+    return _SQLiteBucketStore(db) if db is not None else _LocalBucketStore()
+
+
+# ---------------------------------------------------------------------------
+# Token bucket
+# ---------------------------------------------------------------------------
+
+class TokenBucket:
+    """Token bucket with adaptive slowdown.
+
+    ``reserve`` takes a token immediately (the balance may go negative) and
+    returns how long the caller must wait for it, so no lock is held while
+    sleeping and the same bucket serves threads and coroutines.
+    A 429 halves the effective rate (down to ``min_factor``) and honours
+    ``Retry-After``; every successful response recovers it a little.
+    Times are wall-clock so the state can be shared between processes.
+    """
+
+    def __init__(self, host: str, config: BucketConfig, store) -> None:
+        self.host = host
+        self.config = config
+        self._store = store
+        self.blocking = store.blocking
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.throttled = 0
+        self.total_wait_sec = 0.0
+        self.max_wait_sec = 0.0
+
+    def _initial_state(self) -> BucketState:
+        return BucketState(tokens=self.config.burst, updated=time.time())
+
+    def _refill(self, state: BucketState, now: float) -> None:
+        elapsed = max(0.0, now - state.updated)
+        rate = self.config.rate_per_sec * state.factor
+        state.tokens = min(self.config.burst, state.tokens + elapsed * rate)
+        state.updated = now
+
+    def _update(self, fn: Callable[[BucketState, float], T]) -> T:
+        def apply(state: BucketState) -> T:
+            now = time.time()
+            self._refill(state, now)
+            return fn(state, now)
+
+        return self._store.update(self.host, self._initial_state, apply)
+
+    def reserve(self) -> float:
+        if self.config.rate_per_sec <= 0:
+            delay = 0.0
+        else:
+            def take(state: BucketState, now: float) -> float:
+                state.tokens -= 1
+                wait = max(0.0, -state.tokens / (self.config.rate_per_sec * state.factor))
+                return max(wait, state.blocked_until - now)
+
+            delay = self._update(take)
+        with self._lock:
+            self.acquired += 1
+            self.total_wait_sec += delay
+            self.max_wait_sec = max(self.max_wait_sec, delay)
+        return delay
+
+    def observe(self, status_code: int, retry_after: Optional[float] = None) -> None:
+        if self.config.rate_per_sec <= 0:
+            return
+        if status_code == 429:
+            with self._lock:
+                self.throttled += 1
+
+            def slow_down(state: BucketState, now: float) -> float:
+                state.factor = max(self.config.min_factor, state.factor / 2)
+                if retry_after:
+                    state.blocked_until = max(state.blocked_until, now + retry_after)
+                return self.config.rate_per_sec * state.factor
+
+            rate = self._update(slow_down)
+            log.warning("rate_limit_slowdown", extra=dict(host=self.host, rate=rate))
+        elif status_code < 400:
+            def recover(state: BucketState, now: float) -> None:
+                if state.factor < 1.0:
+                    state.factor = min(1.0, state.factor * self.config.recovery)
+
+            self._update(recover)
+
+    def metrics(self) -> Dict[str, float]:
+        state = self._update(lambda st, now: BucketState(*astuple(st)))
+        with self._lock:
+            return dict(
+                tokens_available=round(state.tokens, 3),
+                burst=self.config.burst,
+                rate_per_sec=round(self.config.rate_per_sec * state.factor, 3),
+                slowdown_factor=round(state.factor, 3),
+                acquired=self.acquired,
+                throttled=self.throttled,
+                total_wait_sec=round(self.total_wait_sec, 3),
+                max_wait_sec=round(self.max_wait_sec, 3),
+            )
+
+
+# ---------------------------------------------------------------------------
+# Per-host limiter
+# ---------------------------------------------------------------------------
+
+class RateLimiter:
+    """One :class:`TokenBucket` per hostname, created on first use.
+
+    Bucket state lives in the SHARED_STATE_DB database when it is set, so
+    every worker process shares one budget per host.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._store = _make_bucket_store()
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = (urlparse(url).hostname or "").lower()
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(host, _load_bucket_config(host), self._store)
+                self._buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url: str) -> float:
+        delay = self.bucket(url).reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self, url: str) -> float:
+        bucket = self.bucket(url)
+        delay = await asyncio.to_thread(bucket.reserve) if bucket.blocking else bucket.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def observe(self, url: str, status_code: int, retry_after: Optional[float] = None) -> None:
+        self.bucket(url).observe(status_code, retry_after)
+
+    async def observe_async(self, url: str, status_code: int, retry_after: Optional[float] = None) -> None:
+        bucket = self.bucket(url)
+        if bucket.blocking:
+            await asyncio.to_thread(bucket.observe, status_code, retry_after)
+        else:
+            bucket.observe(status_code, retry_after)
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {host: bucket.metrics() for host, bucket in buckets.items()}
+
+
+rate_limiter = RateLimiter()
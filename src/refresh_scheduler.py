@@ -0,0 +1,382 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, fields, replace
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from src.http_client import HTTPBadStatusCodeError
+
+log = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Index of generated users
+# ---------------------------------------------------------------------------
+
+@dataclass
+class UserRecord:
+    folder: str
+    fullname: str
+    name: str
+    id_auteur: int
+    fingerprint: str = ""
+    last_refresh: float = 0.0
+    last_served: float = 0.0
+    served: int = 0  # badge hits since the last refresh
+    failures: int = 0  # failed refreshes in a row
+    last_failure: float = 0.0
+    claimed_until: float = 0.0  # a worker is refreshing this user until then
+
+
+def _retry_after_failures(failures: int) -> float:
+    """Backoff before a user whose refresh failed ``failures`` times in a row is due again."""
+    if failures <= 0:
+        return 0.0
+    base = float(os.environ.get("REFRESH_FAILURE_BACKOFF_SEC", "900"))
+    cap = float(os.environ.get("REFRESH_FAILURE_BACKOFF_MAX_SEC", str(7 * 24 * 60 * 60)))
+    return min(cap, base * 2 ** (failures - 1))
+
+
+def _reload_sec() -> float:
+    return float(os.environ.get("BADGE_ETAG_RECHECK_SEC", "60"))
+
+
+def _user_index_path() -> Path:
+    default = Path(os.environ.get("STORAGE_FOLDER", "storage_clients")) / ".users_index.json"
+    return Path(os.environ.get("USER_INDEX_FILE") or default)
+
+
+class UserIndex:
+    """Every user a badge was generated for, persisted as JSON next to the badges.
+
+    Badge hits are counted in memory and merged into the file on
+    :meth:`flush`; the file is re-read before each write so several worker
+    processes can share it. Writes and refresh claims hold an exclusive
+    lock on a ``.lock`` file next to it, and the refresh budget is kept
+    in a ``.budget.json`` file there too, so it is shared by all workers.
+    An unknown id re-reads the file at most once every
+    ``BADGE_ETAG_RECHECK_SEC``.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path or _user_index_path()
+        self._lock = threading.Lock()
+        self._records: Dict[str, UserRecord] = {}
+        self._by_id: Dict[int, str] = {}  # id_auteur -> folder
+        self._last_reload = 0.0
+        self._served: Dict[str, Tuple[int, float]] = {}
+        self._released: Set[str] = set()  # claims given back since the last merge
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @property
+    def _budget_path(self) -> Path:
+        return self.path.with_suffix(".budget.json")
+
+    def _read_budget(self, now: float) -> List[float]:
+        """Start times of the refreshes claimed in the last hour, by any worker."""
+        try:
+            starts = json.loads(self._budget_path.read_text())
+        except (OSError, ValueError):
+            return []
+        return [t for t in starts if t > now - 3600]
+
+    def _read(self) -> Dict[str, UserRecord]:
+        try:
+            raw = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+        names = {f.name for f in fields(UserRecord)}
+        return {
+            folder: UserRecord(**{k: v for k, v in item.items() if k in names})
+            for folder, item in raw.items()
+        }
+
+    def _write(self, records: Dict[str, UserRecord]) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps({folder: asdict(rec) for folder, rec in records.items()}))
+            tmp.replace(self.path)
+        except OSError:
+            log.warning("user_index_write_failed", extra=dict(path=str(self.path)))
+
+    def _merge(self) -> None:
+        # Keep whichever copy of a record was refreshed last, then apply our pending hits.
+        merged = self._read()
+        for folder, rec in self._records.items():
+            other = merged.get(folder)
+            if other is None or rec.last_refresh >= other.last_refresh:
+                if other is not None and other.last_refresh == rec.last_refresh:
+                    rec.served = max(rec.served, other.served)
+                    rec.last_served = max(rec.last_served, other.last_served)
+                    if folder not in self._released:
+                        rec.claimed_until = max(rec.claimed_until, other.claimed_until)
+                    if other.last_failure > rec.last_failure:
+                        rec.failures, rec.last_failure = other.failures, other.last_failure
+                merged[folder] = rec
+        for folder, (count, last) in self._served.items():
+            rec = merged.get(folder)
+            if rec is not None:
+                rec.served += count
+                rec.last_served = max(rec.last_served, last)
+        self._served.clear()
+        self._released.clear()
+        self._records = merged
+        self._by_id = {int(rec.id_auteur): folder for folder, rec in merged.items()}
+        self._last_reload = time.time()
+
+    def flush(self) -> None:
+        with self._lock, self._file_lock():
+            self._merge()
+            self._write(self._records)
+
+    def record_refresh(self, folder: str, data: Dict, id_auteur: int, fingerprint: str) -> bool:
+        """Note a (re)generation; True when the user is new or their badges changed."""
+        with self._lock:
+            rec = self._records.get(folder)
+            if rec is None:
+                rec = self._records[folder] = UserRecord(folder, data["fullname"], data["name"], id_auteur)
+            changed = rec.fingerprint != fingerprint
+            rec.fullname, rec.name, rec.id_auteur = data["fullname"], data["name"], id_auteur
+            rec.fingerprint = fingerprint
+            self._by_id[int(id_auteur)] = folder
+            self._refreshed(rec)
+        return changed
+
+    def _refreshed(self, rec: UserRecord) -> None:
+        rec.last_refresh = time.time()
+        rec.served = 0
+        rec.failures = 0
+        rec.claimed_until = 0.0
+        self._served.pop(rec.folder, None)
+
+    def record_unchanged(self, folder: str) -> None:
+        with self._lock:
+            rec = self._records.get(folder)
+            if rec is not None:
+                self._refreshed(rec)
+
+    def record_failure(self, folder: str) -> None:
+        """A refresh failed: back off exponentially before trying this user again."""
+        with self._lock:
+            rec = self._records.get(folder)
+            if rec is not None:
+                rec.failures += 1
+                rec.last_failure = time.time()
+                rec.claimed_until = 0.0
+                self._released.add(folder)
+
+    def release(self, folders: Iterable[str]) -> None:
+        """Give back claimed users that were not attempted."""
+        with self._lock:
+            for folder in folders:
+                rec = self._records.get(folder)
+                if rec is not None:
+                    rec.claimed_until = 0.0
+                    self._released.add(folder)
+
+    def mark_served(self, folder: str) -> None:
+        with self._lock:
+            count, _ = self._served.get(folder, (0, 0.0))
+            self._served[folder] = (count + 1, time.time())
+
+    @staticmethod
+    def _available(rec: UserRecord, now: float) -> bool:
+        """Neither claimed by a worker nor backing off after failures."""
+        return now >= rec.claimed_until and now >= rec.last_failure + _retry_after_failures(rec.failures)
+
+    def _due(self, now: float, min_age_sec: float) -> List[UserRecord]:
+        """Available users not refreshed for ``min_age_sec``, most-served first."""
+        stale = [
+            rec for rec in self._records.values()
+            if now - rec.last_refresh >= min_age_sec and self._available(rec, now)
+        ]
+        return sorted(stale, key=lambda rec: (-rec.served, -rec.last_served, rec.last_refresh))
+
+    def claim(
+        self, batch_size: int, budget_per_hour: int, min_age_sec: float, claim_sec: float, wanted: Iterable[str] = ()
+    ) -> List[UserRecord]:
+        """Reserve the next due users for this worker, within the hourly budget shared by all workers.
+
+        Available ``wanted`` folders come first, however recently refreshed.
+        Claimed users are skipped by other workers for ``claim_sec`` or until
+        their refresh is recorded.
+        """
+        now = time.time()
+        with self._lock, self._file_lock():
+            self._merge()
+            starts = self._read_budget(now)
+            limit = max(0, min(batch_size, budget_per_hour - len(starts)))
+            first = [
+                self._records[folder] for folder in wanted
+                if folder in self._records and self._available(self._records[folder], now)
+            ]
+            picked = {rec.folder for rec in first}
+            batch = (first + [rec for rec in self._due(now, min_age_sec) if rec.folder not in picked])[:limit]
+            for rec in batch:
+                rec.claimed_until = now + claim_sec
+                starts.append(now)
+            if batch:
+                self._write(self._records)
+                try:
+                    self._budget_path.write_text(json.dumps(starts))
+                except OSError:
+                    log.warning("refresh_budget_write_failed", extra=dict(path=str(self._budget_path)))
+            return [replace(rec) for rec in batch]
+
+    def budget_left(self, budget_per_hour: int) -> int:
+        return max(0, budget_per_hour - len(self._read_budget(time.time())))
+
+    def find(self, id_auteur: int) -> Optional[UserRecord]:
+        """The user with this Root-Me id, re-reading the file if another worker may have added it."""
+        with self._lock:
+            folder = self._by_id.get(id_auteur)
+            if folder is None and time.time() - self._last_reload >= _reload_sec():
+                self._merge()
+                folder = self._by_id.get(id_auteur)
+            return self._records.get(folder) if folder is not None else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._records)
+
+
+user_index = UserIndex()
+
+
+# ---------------------------------------------------------------------------
+# Scheduler
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class SchedulerConfig:
+    enabled: bool
+    interval_sec: float
+    batch_size: int
+    budget_per_hour: int
+    min_age_sec: float
+
+
+def _load_scheduler_config() -> SchedulerConfig:
+    return SchedulerConfig(
+        enabled=os.environ.get("REFRESH_SCHEDULER_ENABLED", "1").strip().lower() not in ("0", "false", "no", ""),
+        interval_sec=float(os.environ.get("REFRESH_INTERVAL_SEC", "300")),
+        batch_size=int(os.environ.get("REFRESH_BATCH_SIZE", "10")),
+        budget_per_hour=int(os.environ.get("REFRESH_BUDGET_PER_HOUR", "120")),
+        min_age_sec=float(os.environ.get("REFRESH_MIN_AGE_SEC", str(6 * 60 * 60))),
+    )
+
+
+# Returns True when the badges were re-rendered, False when the user's data was unchanged.
+RefreshFn = Callable[[UserRecord], Awaitable[bool]]
+
+
+class RefreshScheduler:
+    """Re-fetches and re-renders stored badges in small batches.
+
+    Each run refreshes at most ``REFRESH_BATCH_SIZE`` users that have not
+    been refreshed for ``REFRESH_MIN_AGE_SEC``, badges being served first,
+    without exceeding ``REFRESH_BUDGET_PER_HOUR`` refreshes in any hour.
+    Batches and the budget are claimed through the index, so several
+    workers neither overspend nor refresh the same user. A user whose
+    refresh fails is skipped for ``REFRESH_FAILURE_BACKOFF_SEC``, doubled
+    on each further failure. Users are processed one at a time so the
+    upstream rate limiter paces them behind interactive requests; a 429
+    ends the batch early. Users passed to :meth:`request` wake the
+    scheduler and go first, still within the budget.
+    """
+
+    def __init__(self, index: UserIndex, refresh: RefreshFn, config: Optional[SchedulerConfig] = None) -> None:
+        self.index = index
+        self._refresh = refresh
+        self.config = config or _load_scheduler_config()
+        self.refreshed = 0
+        self.unchanged = 0
+        self.failed = 0
+        self._wanted: Set[str] = set()
+        self._wake = asyncio.Event()
+
+    def _claim_sec(self) -> float:
+        # Long enough for a batch to finish; a worker that dies mid-batch frees its users after it.
+        return max(600.0, 2 * self.config.interval_sec)
+
+    def request(self, folder: str) -> None:
+        """Refresh this user in the next batch, whatever their age."""
+        self._wanted.add(folder)
+        self._wake.set()
+
+    async def run_once(self) -> int:
+        """Refresh one batch and return how many users were processed."""
+        cfg = self.config
+        batch = await asyncio.to_thread(
+            self.index.claim,
+            cfg.batch_size,
+            cfg.budget_per_hour,
+            cfg.min_age_sec,
+            self._claim_sec(),
+            list(self._wanted),
+        )
+        self._wanted.difference_update(rec.folder for rec in batch)
+        for position, rec in enumerate(batch):
+            try:
+                changed = await self._refresh(rec)
+            except HTTPBadStatusCodeError as err:
+                self.failed += 1
+                self.index.record_failure(rec.folder)
+                log.warning("badge_refresh_failed", extra=dict(fullname=rec.fullname, status=err.code))
+                if err.code == 429:
+                    self.index.release(other.folder for other in batch[position + 1:])
+                    break
+                continue
+            except Exception:
+                self.failed += 1
+                self.index.record_failure(rec.folder)
+                log.exception("badge_refresh_failed", extra=dict(fullname=rec.fullname))
+                continue
+            if changed:
+                self.refreshed += 1
+            else:
+                self.unchanged += 1
+                self.index.record_unchanged(rec.folder)
+        await asyncio.to_thread(self.index.flush)
+        if batch:
+            budget_left = await asyncio.to_thread(self.index.budget_left, cfg.budget_per_hour)
+            log.info("badge_refresh_batch", extra=dict(size=len(batch), budget_left=budget_left))
+        return len(batch)
+
+    async def run_forever(self, ready: asyncio.Event) -> None:
+        await ready.wait()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.config.interval_sec)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.run_once()
+            except Exception:
+                log.exception("badge_refresh_run_failed")
+
+    def metrics(self) -> Dict[str, int]:
+        return dict(
+            users=len(self.index),
+            budget_left=self.index.budget_left(self.config.budget_per_hour),
+            refreshed=self.refreshed,
+            unchanged=self.unchanged,
+            failed=self.failed,
+        )
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+from src.static_badge import get_available_themes, make_static_badges, render_badge_bytes, warm_asset_cache
+from src.svg_badge import make_svg_badges, render_svg, warm_font_subset
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def _warm_worker() -> None:
+    warm_asset_cache()
+    warm_font_subset()
+
+
+def _render_user(data: Dict, folder_path: str, avatar_path: str, font_url: Optional[str]) -> List[Dict[str, str]]:
+    save_paths = make_static_badges(data, folder_path, avatar_path)
+    make_svg_badges(data, folder_path, avatar_path, font_url)
+    return save_paths
+
+
+def _render_svg_bytes(data: Dict, avatar_path: str, theme: str, width: int, height: int) -> bytes:
+    return render_svg(data, avatar_path, theme, width, height).encode()
+
+
+class RenderPoolFullError(RuntimeError):
+    def __init__(self, pending: int, max_queue: int):
+        self.pending = pending
+        self.max_queue = max_queue
+        super().__init__(f"render queue is full ({pending}/{max_queue} badges pending)")
+
+
+class RenderPool:
+    """Renders static badges in worker processes, one task per user.
+
+    Pillow holds the GIL for most of a render, so running it in the web
+    process (even in a thread) stalls other requests; so does fontTools
+    when it subsets the SVG font. A user's themes (PNG and SVG) are
+    rendered by the same worker so their avatar is decoded once.
+    ``RENDER_POOL_WORKERS`` sets the pool size (0 renders in a thread
+    instead) and ``RENDER_POOL_MAX_QUEUE`` caps the badges queued or
+    rendering at once; past that, :meth:`render` raises
+    :class:`RenderPoolFullError`. A pool broken by a crashed worker is
+    replaced and the task retried once.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_queue: Optional[int] = None) -> None:
+        if workers is None:
+            workers = max(0, int(os.environ.get("RENDER_POOL_WORKERS", str(min(4, os.cpu_count() or 1)))))
+        self.workers = workers
+        self.max_queue = max_queue if max_queue is not None else int(os.environ.get("RENDER_POOL_MAX_QUEUE", "64"))
+        self.pending = 0
+        self.rejected = 0
+        self.restarts = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self) -> None:
+        if self.workers and self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+            log.info("render_pool_started", extra=dict(workers=self.workers, max_queue=self.max_queue))
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        # Concurrent tasks all see the same broken pool: only the first replaces it.
+        if self._executor is not broken:
+            return
+        log.warning("render_pool_broken", extra=dict(workers=self.workers))
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self.restarts += 1
+        self.start()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _reserve(self, count: int) -> None:
+        if self.pending + count > self.max_queue:
+            self.rejected += 1
+            log.warning("render_pool_full", extra=dict(pending=self.pending, max_queue=self.max_queue))
+            raise RenderPoolFullError(self.pending, self.max_queue)
+        self.pending += count
+
+    async def _run(self, fn: Callable[..., T], *args) -> T:
+        executor = self._executor
+        if executor is None:
+            return await asyncio.to_thread(fn, *args)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            self._restart(executor)
+            if self._executor is None:
+                return await asyncio.to_thread(fn, *args)
+            return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def render(
+        self, data: Dict, folder_path: str, avatar_path: str, font_url: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """Write every theme's PNG and SVG badge for one user and return ``make_static_badges``'s paths."""
+        count = len(get_available_themes())
+        self._reserve(count)
+        try:
+            return await self._run(_render_user, data, folder_path, avatar_path, font_url)
+        finally:
+            self.pending -= count
+
+    async def render_bytes(self, data: Dict, avatar_path: str, theme: str, size: Tuple[int, int], fmt: str) -> bytes:
+        """Render a single badge at ``size`` and return it encoded as ``fmt`` (``svg`` included)."""
+        self._reserve(1)
+        try:
+            if fmt == "svg":
+                return await self._run(_render_svg_bytes, data, avatar_path, theme, size[0], size[1])
+            return await self._run(render_badge_bytes, data, avatar_path, theme, size[0], size[1], fmt)
+        finally:
+            self.pending -= 1
+
+    def metrics(self) -> Dict[str, int]:
+        return dict(
+            workers=self.workers,
+            max_queue=self.max_queue,
+            pending=self.pending,
+            rejected=self.rejected,
+            restarts=self.restarts,
+        )
+
+
+render_pool = RenderPool()
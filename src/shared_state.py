@@ -0,0 +1,73 @@
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator, Optional
+
+log = logging.getLogger(__name__)
+
+
+class SharedDB:
+    """SQLite database in WAL mode used to share state between worker processes.
+
+    Each process (and each fork) opens its own connection lazily; inside a
+    process the connection is serialised by a lock. Writers use
+    ``BEGIN IMMEDIATE`` so read-modify-write sequences are atomic across
+    processes. Stores built on it set ``blocking = True``: their calls may
+    wait on the database lock, so async callers run them in a thread.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.busy_timeout = float(os.environ.get("SHARED_STATE_BUSY_TIMEOUT_SEC", "5"))
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn = conn
+            self._pid = os.getpid()
+            log.info("shared_state_connected", extra=dict(path=self.path, pid=self._pid))
+        return self._conn
+
+    def ensure_schema(self, script: str) -> None:
+        with self._lock:
+            self._connection().executescript(script)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            yield self._connection()
+
+
+@lru_cache(maxsize=None)
+def _open_shared_db(path: str) -> SharedDB:
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    return SharedDB(path)
+
+
+def shared_db() -> Optional[SharedDB]:
+    """The database named by SHARED_STATE_DB, or None to keep state in-process."""
+    path = (os.environ.get("SHARED_STATE_DB") or "").strip()
+    if not path:
+        return None
+    return _open_shared_db(path)
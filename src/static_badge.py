@@ -1,7 +1,15 @@
-from os.path import abspath, dirname, isdir
-from typing import Dict, List, Optional, Tuple
+import hashlib
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from os.path import basename, isdir
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw, ImageFont, features
 
 from src.themes import DarkTheme, LightTheme, Theme
 
@@ -12,6 +20,129 @@ THEMES: Dict[str, Theme] = {
     "dark": DarkTheme,
 }
 
+DEFAULT_SIZE = (500, 200)
+
+# Bump whenever the badge layout or encoding changes so stored badges get re-rendered.
+RENDER_VERSION = 3
+
+# Keys of extract_data's output that a badge is drawn from.
+RENDER_FIELDS = ("name", "score", "rank", "ranking", "ranking_tot")
+
+# Pillow save options per output format.
+ENCODE_OPTIONS: Dict[str, Dict] = {
+    "png": dict(format="PNG", optimize=True),
+    "webp": dict(format="WEBP", lossless=True, method=2),
+    "avif": dict(format="AVIF", quality=80),
+}
+
+
+@dataclass(frozen=True)
+class TextItem:
+    xy: Tuple[int, int]
+    text: str
+    size: int
+    color: Tuple[int, int, int]
+
+
+# ---------------------------------------------------------------------------
+# Process-wide asset cache
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=32)
+def _load_font(size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(FONT_PATH, size=size)
+
+
+@lru_cache(maxsize=32)
+def _load_logo(path: str, side: int) -> Image.Image:
+    logo = Image.open(path)
+    return logo.resize(size=(side, side), resample=Image.BICUBIC)
+
+
+def text_ascent(size: int) -> int:
+    """Distance from the top of a text layer to its baseline."""
+    return _load_font(size).getmetrics()[0]
+
+
+def theme_logo(theme: Theme, side: int) -> Image.Image:
+    return _load_logo(theme.logo, side)
+
+
+def logo_box(width: int, height: int) -> Tuple[Tuple[int, int], int]:
+    """Top-left corner and side of the theme logo."""
+    side = int(height / 3)
+    return (int(width - side - height * 0.1), int(height * 0.1)), side
+
+
+@lru_cache(maxsize=32)
+def _theme_background(theme: Theme, width: int, height: int) -> Image.Image:
+    """Background colour with the theme logo already pasted; callers must copy it."""
+    background = Image.new(mode="RGB", size=(width, height), color=theme.background_color)
+    offset, side = logo_box(width, height)
+    logo = _load_logo(theme.logo, side)
+    background.paste(im=logo, box=offset, mask=logo)
+    return background
+
+
+@lru_cache(maxsize=4096)
+def _text_layer(text: str, size: int) -> Tuple[Image.Image, Tuple[int, int]]:
+    """Anti-aliased mask of ``text`` and its offset from the draw position.
+
+    The mask does not depend on the colour, so one rendering serves every
+    theme (and every user sharing the same rank title).
+    """
+    font = _load_font(size)
+    left, top, right, bottom = font.getbbox(text)
+    mask = Image.new(mode="L", size=(max(1, right - left), max(1, bottom - top)))
+    ImageDraw.Draw(mask).text(xy=(-left, -top), text=text, fill=255, font=font)
+    return mask, (left, top)
+
+
+# Decoded, resized avatars keyed by (content sha256, side), shared by every theme and re-render.
+_avatar_thumbnails: "OrderedDict[Tuple[str, int], Image.Image]" = OrderedDict()
+_avatar_lock = threading.Lock()
+_CONTENT_ADDRESSED = re.compile(r"^[0-9a-f]{64}\.")
+
+
+def _avatar_source(path: str) -> Tuple[str, Optional[bytes]]:
+    # Avatars from AvatarStore are named after their hash; others are hashed here.
+    name = basename(path)
+    if _CONTENT_ADDRESSED.match(name):
+        return name.split(".", 1)[0], None
+    with open(path, "rb") as f:
+        content = f.read()
+    return hashlib.sha256(content).hexdigest(), content
+
+
+def avatar_thumbnail(path: str, side: int) -> Image.Image:
+    """``path`` decoded (first frame if animated) and resized to ``side`` x ``side``; do not modify the result."""
+    digest, content = _avatar_source(path)
+    key = (digest, side)
+    with _avatar_lock:
+        thumbnail = _avatar_thumbnails.get(key)
+        if thumbnail is not None:
+            _avatar_thumbnails.move_to_end(key)
+            return thumbnail
+
+    with Image.open(io.BytesIO(content) if content is not None else path) as image:
+        if getattr(image, "is_animated", False):
+            image.seek(0)
+        thumbnail = image.resize(size=(side, side), resample=Image.BICUBIC)
+
+    with _avatar_lock:
+        _avatar_thumbnails[key] = thumbnail
+        while len(_avatar_thumbnails) > int(os.environ.get("AVATAR_THUMBNAIL_CACHE_SIZE", "256")):
+            _avatar_thumbnails.popitem(last=False)
+    return thumbnail
+
+
+def warm_asset_cache(sizes: Tuple[Tuple[int, int], ...] = (DEFAULT_SIZE,)) -> None:
+    for width, height in sizes:
+        for fraction in (0.10, 0.15):
+            _load_font(int(height * fraction))
+        for theme in THEMES.values():
+            _theme_background(theme, width, height)
+
 
 class Badge:
     def __init__(
@@ -39,44 +170,15 @@ class Badge:
 
     # -- Drawing primitives -------------------------------------------------
 
-    def _draw_profile_picture(self) -> None:
-        pp = Image.open(self.pp)
-        size = self._square_size(2 / 3)
-        pp = pp.resize(size=size, resample=Image.BICUBIC)
-        offset = self._square_size(0.1)
-        self.badge.paste(pp, offset)
-
-    def _draw_username(self) -> None:
-        font = self._font(0.15)
-        draw = ImageDraw.Draw(self.badge)
-        offset = (self._right_column_x(), self._y(0.1))
-        draw.text(xy=offset, text=self.pseudo, fill=self.theme.username_color, font=font)
-
-    def _draw_points(self) -> None:
-        font = self._font(0.10)
-        draw = ImageDraw.Draw(self.badge)
-        offset = (self._right_column_x(), self._y(0.35))
-        draw.text(xy=offset, text=f"{self.score} pts", fill=self.theme.score_color, font=font)
-
-    def _draw_ranking(self) -> None:
-        font = self._font(0.10)
-        draw = ImageDraw.Draw(self.badge)
-        offset = (self._right_column_x(), self._y(0.50))
-        text = self._ranking_text()
-        draw.text(xy=offset, text=text, fill=self.theme.ranking_color, font=font)
-
-    def _draw_title(self) -> None:
-        font = self._font(0.15)
-        draw = ImageDraw.Draw(self.badge)
-        offset = (self._y(0.1), self._y(0.8))
-        draw.text(xy=offset, text=self.title, fill=self.theme.title_color, font=font)
-
-    def _draw_logo(self) -> None:
-        size = self._square_size(1 / 3)
-        logo = Image.open(self.theme.logo)
-        logo = logo.resize(size=size, resample=Image.BICUBIC)
-        offset = (int(self.width - size[0] - self.height * 0.1), self._y(0.1))
-        self.badge.paste(im=logo, box=offset, mask=logo)
+    def _load_profile_picture(self) -> Image.Image:
+        return avatar_thumbnail(self.pp, self.avatar_box()[1])
+
+    def _draw_profile_picture(self, pp: Image.Image) -> None:
+        self.badge.paste(pp, self.avatar_box()[0])
+
+    def _draw_text(self, item: TextItem) -> None:
+        mask, (dx, dy) = _text_layer(item.text, item.size)
+        self.badge.paste(item.color, (item.xy[0] + dx, item.xy[1] + dy), mask)
 
     # -- Layout helpers -----------------------------------------------------
 
@@ -90,8 +192,19 @@ class Badge:
     def _right_column_x(self) -> int:
         return int(self.height * (2 / 3)) + int(self.height * 0.2)
 
-    def _font(self, size_fraction: float) -> ImageFont.FreeTypeFont:
-        return ImageFont.truetype(FONT_PATH, size=int(self.height * size_fraction))
+    def avatar_box(self) -> Tuple[Tuple[int, int], int]:
+        """Top-left corner and side of the profile picture."""
+        return self._square_size(0.1), self._square_size(2 / 3)[0]
+
+    def text_items(self) -> List[TextItem]:
+        """Every text layer, in drawing order; shared with the SVG renderer."""
+        right_x = self._right_column_x()
+        return [
+            TextItem((right_x, self._y(0.1)), self.pseudo, self._y(0.15), self.theme.username_color),
+            TextItem((right_x, self._y(0.35)), f"{self.score} pts", self._y(0.10), self.theme.score_color),
+            TextItem((self._y(0.1), self._y(0.8)), self.title, self._y(0.15), self.theme.title_color),
+            TextItem((right_x, self._y(0.50)), self._ranking_text(), self._y(0.10), self.theme.ranking_color),
+        ]
 
     def _ranking_text(self) -> str:
         ranking = int(self.ranking)
@@ -104,31 +217,25 @@ class Badge:
 
     # -- Public API ---------------------------------------------------------
 
+    def _compose(self, pp: Image.Image) -> None:
+        """Draw the per-user layers on ``self.badge``, which holds the theme background."""
+        self._draw_profile_picture(pp)
+        for item in self.text_items():
+            self._draw_text(item)
+
     def create(self) -> Image.Image:
-        self.badge = Image.new(mode="RGB", size=(self.width, self.height), color=self.theme.background_color)
-        self._draw_profile_picture()
-        self._draw_username()
-        self._draw_points()
-        self._draw_logo()
-        self._draw_title()
-        self._draw_ranking()
+        # The background already carries the logo (see _theme_background).
+        self.badge = _theme_background(self.theme, self.width, self.height).copy()
+        self._compose(self._load_profile_picture())
         return self.badge
 
-    def save(self, filepath: str) -> None:
-        filepath = abspath(filepath)
-        if not isdir(dirname(filepath)):
-            raise IOError(f"The folder does not exist: '{dirname(filepath)}'")
-        if self.badge is None:
-            self.create()
-        self.badge.save(filepath)
-
 
 def get_available_themes() -> List[str]:
     return sorted(THEMES.keys())
 
 
-def make_static_badge(data: Dict, theme: str, folder_path: str, avatar_path: str) -> str:
-    badge = Badge(
+def badge_from_data(data: Dict, avatar_path: str, theme: str, width: int, height: int) -> Badge:
+    return Badge(
         pseudo=data["name"],
         profile_picture=avatar_path,
         score=data["score"],
@@ -136,15 +243,97 @@ def make_static_badge(data: Dict, theme: str, folder_path: str, avatar_path: str
         ranking=data["ranking"],
         total_users=data["ranking_tot"],
         theme=theme,
+        width=width,
+        height=height,
     )
-    badge.create()
+
+
+def render_many(
+    batch: Iterable[Dict],
+    themes: Optional[List[str]] = None,
+    width: int = DEFAULT_SIZE[0],
+    height: int = DEFAULT_SIZE[1],
+) -> Iterator[Tuple[Dict, str, Image.Image]]:
+    """Render every theme for every user of ``batch``, yielding ``(data, theme, image)``.
+
+    Each ``data`` dict is shaped like ``extract_data``'s output plus an
+    ``avatar_path`` key. One canvas per theme is reset from the cached
+    background and reused for every user, and each avatar is decoded once
+    for all themes: the yielded image is overwritten by the next step, so
+    save or copy it before advancing.
+    """
+    themes = themes or get_available_themes()
+    canvases = {theme: _theme_background(THEMES[theme], width, height).copy() for theme in themes}
+    for data in batch:
+        pp = None
+        for theme in themes:
+            badge = badge_from_data(data, data["avatar_path"], theme, width, height)
+            if pp is None:
+                pp = badge._load_profile_picture()
+            badge.badge = canvases[theme]
+            badge.badge.paste(_theme_background(badge.theme, width, height))
+            badge._compose(pp)
+            yield data, theme, badge.badge
+
+
+def _exact_palette(image: Image.Image) -> Optional[Image.Image]:
+    """``image`` as a palette image if that keeps every pixel as it was, else None."""
+    if image.mode != "RGB":
+        return None
+    colors = image.getcolors(256)
+    if colors is None:
+        return None
+    paletted = image.convert("P", palette=Image.Palette.ADAPTIVE, colors=len(colors))
+    # The quantizer may still merge near-identical colours: only keep an exact round trip.
+    if paletted.convert("RGB").tobytes() != image.tobytes():
+        return None
+    return paletted
+
+
+def encode_image(image: Image.Image, fmt: str) -> bytes:
+    if fmt == "png":
+        image = _exact_palette(image) or image
+    buffer = io.BytesIO()
+    image.save(buffer, **ENCODE_OPTIONS[fmt])
+    return buffer.getvalue()
+
+
+def sibling_formats() -> List[str]:
+    """Formats written next to each static PNG badge (BADGE_SIBLING_FORMATS), if Pillow can encode them."""
+    raw = os.environ.get("BADGE_SIBLING_FORMATS", "webp,avif")
+    requested = [fmt.strip().lower() for fmt in raw.split(",") if fmt.strip()]
+    return [fmt for fmt in requested if fmt in ENCODE_OPTIONS and fmt != "png" and features.check(fmt)]
+
+
+def _write_image(image: Image.Image, filepath: str) -> None:
+    fmt = filepath.rsplit(".", 1)[-1].lower()
+    if fmt not in ENCODE_OPTIONS:
+        image.save(filepath)
+        return
+    with open(filepath, "wb") as f:
+        f.write(encode_image(image, fmt))
+
+
+def _save_static_badge(image: Image.Image, folder_path: str, theme: str) -> str:
+    """Write the PNG badge and its sibling formats; returns the PNG path."""
     save_path = f"{folder_path}/static_badge_{theme}.png"
-    badge.save(save_path)
+    for fmt in sibling_formats():
+        _write_image(image, f"{folder_path}/static_badge_{theme}.{fmt}")
+    _write_image(image, save_path)
     return save_path
 
 
+def render_badge_bytes(data: Dict, avatar_path: str, theme: str, width: int, height: int, fmt: str = "png") -> bytes:
+    """One badge at any size, encoded as ``fmt`` (a key of ENCODE_OPTIONS)."""
+    badge = badge_from_data(data, avatar_path, theme, width, height)
+    return encode_image(badge.create(), fmt)
+
+
 def make_static_badges(data: Dict, folder_path: str, avatar_path: str) -> List[Dict[str, str]]:
-    return [
-        dict(theme=theme, path=make_static_badge(data, theme, folder_path, avatar_path))
-        for theme in get_available_themes()
-    ]
+    if not isdir(folder_path):
+        raise IOError(f"The folder does not exist: '{folder_path}'")
+    save_paths = []
+    for _, theme, image in render_many([dict(data, avatar_path=avatar_path)]):
+        save_path = _save_static_badge(image, folder_path, theme)
+        save_paths.append(dict(theme=theme, path=save_path))
+    return save_paths
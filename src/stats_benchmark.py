@@ -0,0 +1,151 @@
+"""Upstream requests made by the Root-Me stats refresh, against an in-process stub API.
+
+    python -m src.stats_benchmark [--users 250000] [--challenges 560] [--drift 300]
+
+Counts the ``/auteurs`` and ``/challenges`` listing pages requested by the
+previous algorithms (bisection over 0..10^6 with two requests per step, and
+a page-by-page scan, both run on every start) and by :class:`AsyncRMAPI`:
+at a start with no persisted counts, at a restart while they are fresh,
+and at the daily refresh once the listings have grown by ``--drift``. The
+time column is what those requests cost at ROOTME_MIN_REQUEST_INTERVAL_SEC
+pacing.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+
+from src.http_client import LISTING_PAGE_SIZE, AsyncRMAPI, ResponseCache, save_stats_snapshot
+
+STUB_HOST = "stub.invalid"
+
+
+class ListingStub:
+    """Paginated ``/auteurs`` and ``/challenges`` listings shaped like the Root-Me API's."""
+
+    def __init__(self, totals: Dict[str, int]) -> None:
+        self.totals = totals
+        self.calls = 0
+
+    def page(self, path: str, offset: int) -> List[dict]:
+        self.calls += 1
+        total = self.totals[path]
+        items = {str(i): {"id": str(offset + i)} for i in range(max(0, min(LISTING_PAGE_SIZE, total - offset)))}
+        links = []
+        if offset > 0:
+            links.append({"rel": "previous", "href": f"{path}?debut_{path}={max(0, offset - LISTING_PAGE_SIZE)}"})
+        if offset + LISTING_PAGE_SIZE < total:
+            links.append({"rel": "next", "href": f"{path}?debut_{path}={offset + LISTING_PAGE_SIZE}"})
+        return [items, *links]
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path.strip("/")
+        offset = int(parse_qs(urlparse(str(request.url)).query).get(f"debut_{path}", ["0"])[0])
+        return httpx.Response(200, content=json.dumps(self.page(path, offset)).encode())
+
+
+# ---------------------------------------------------------------------------
+# Previous algorithms, kept here as the reference
+# ---------------------------------------------------------------------------
+
+def legacy_count_users(get_page: Callable[[int], List[dict]]) -> int:
+    mini, maxi = 0, 10 ** 6
+    while True:
+        count = (mini + maxi) // 2 + 1
+        data, data_prev = get_page(count), get_page(count - 1)
+        if abs(len(data_prev[0]) - len(data[0])) == 1 or abs(maxi - mini) < 5:
+            return count + len(data[0])
+        if len(data[0]) < LISTING_PAGE_SIZE:
+            maxi = count + 1
+        else:
+            mini = count - 1
+
+
+def legacy_count_challenges(get_page: Callable[[int], List[dict]]) -> int:
+    count = 0
+    while True:
+        data = get_page(count)
+        # The original indexed data[-1]["rel"] and crashed on a single page without links.
+        if data[-1].get("rel", "previous") == "previous":
+            return count + len(data[0])
+        count += LISTING_PAGE_SIZE
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def _legacy_refresh(stub: ListingStub) -> Dict[str, int]:
+    return dict(
+        number_users=legacy_count_users(lambda offset: stub.page("auteurs", offset)),
+        number_challenges=legacy_count_challenges(lambda offset: stub.page("challenges", offset)),
+    )
+
+
+async def _client_refresh(stub: ListingStub, run: Callable[[AsyncRMAPI], Awaitable[None]]) -> Dict[str, int]:
+    api = AsyncRMAPI(cache=ResponseCache(max_entries=0))
+    await api.client.aclose()
+    api.client = httpx.AsyncClient(transport=httpx.MockTransport(stub.handle))
+    try:
+        await run(api)
+        return dict(number_users=api.number_users, number_challenges=api.number_challenges)
+    finally:
+        await api.aclose()
+
+
+async def _startup(api: AsyncRMAPI) -> None:
+    await api._load_stats()
+
+
+async def _daily(api: AsyncRMAPI) -> None:
+    api._seed_stats()
+    await api.update_number_rootme_challenges()
+    await api.update_number_rootme_users()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m src.stats_benchmark", description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=250000, help="users in the stub listing (default: 250000)")
+    parser.add_argument("--challenges", type=int, default=560, help="challenges in the stub listing (default: 560)")
+    parser.add_argument("--drift", type=int, default=300, help="growth since the persisted counts (default: 300)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("API_URL", f"http://{STUB_HOST}")
+    # Count requests without pacing them; the time columns apply the configured pacing instead.
+    os.environ["ROOTME_RATE_LIMIT_HOSTS"] = f"{urlparse(os.environ['API_URL']).hostname}=0"
+    os.environ["ROOTME_STATS_FILE"] = str(Path(tempfile.mkdtemp()) / "stats.json")
+    interval = float(os.environ.get("ROOTME_MIN_REQUEST_INTERVAL_SEC", "0.35") or 0)
+    expected = dict(number_users=args.users, number_challenges=args.challenges)
+
+    def persisted(**counts: int) -> None:
+        Path(os.environ["ROOTME_STATS_FILE"]).unlink(missing_ok=True)
+        if counts:
+            save_stats_snapshot(**counts)
+
+    scenarios = [
+        ("start, no counts", lambda: persisted(), _startup),
+        ("restart, fresh counts", lambda: persisted(**expected), _startup),
+        ("daily refresh", lambda: persisted(**{k: max(0, v - args.drift) for k, v in expected.items()}), _daily),
+    ]
+    print(f"{'scenario':<24}{'old req':>9}{'new req':>9}{'old s':>8}{'new s':>8}  correct")
+    for name, prepare, run in scenarios:
+        old = ListingStub(dict(auteurs=args.users, challenges=args.challenges))
+        old_counts = _legacy_refresh(old)
+        prepare()
+        new = ListingStub(dict(auteurs=args.users, challenges=args.challenges))
+        new_counts = asyncio.run(_client_refresh(new, run))
+        correct = old_counts == expected and new_counts == expected
+        print(
+            f"{name:<24}{old.calls:>9}{new.calls:>9}{old.calls * interval:>8.1f}{new.calls * interval:>8.1f}"
+            f"  {'yes' if correct else 'NO'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
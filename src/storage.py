@@ -1,44 +1,130 @@
-import base64
 import hashlib
+import json
 import os
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
-import magic
+from src import badge_server
+from src.avatar_store import avatar_store
+from src.http_client import AsyncRMAPI
+from src.render_pool import render_pool
+from src.static_badge import FONT_PATH, RENDER_FIELDS, RENDER_VERSION, get_available_themes
 
-from src.http_client import RMAPI
-from src.static_badge import make_static_badges
+MANIFEST_NAME = "manifest.json"
+BADGE_DATA_NAME = "badge.json"
 
 
 def _storage_folder() -> Path:
     return Path(os.environ.get("STORAGE_FOLDER", "storage_clients"))
 
 
+def user_folder_name(fullname: str) -> str:
+    return hashlib.md5(fullname.encode()).hexdigest()
+
+
 def _create_user_folder(fullname: str) -> Path:
-    folder_name = hashlib.md5(fullname.encode()).hexdigest()
-    folder_path = _storage_folder() / folder_name
+    folder_path = _storage_folder() / user_folder_name(fullname)
     folder_path.mkdir(parents=True, exist_ok=True)
     return folder_path
 
 
-def _download_avatar(api: RMAPI, folder_path: Path, avatar_url: str) -> Path:
-    content = api.http_get(avatar_url)
-    extension = magic.from_buffer(content, mime=True).split("/")[-1]
-    avatar_path = folder_path / f"avatar.{extension}"
-    avatar_path.write_bytes(content)
-    return avatar_path
+def badge_fingerprint(data: Dict, avatar_sha256: str) -> str:
+    """Digest of everything the stored badges are rendered from, to tell whether they need re-rendering."""
+    fields = {k: v for k, v in data.items() if k not in ("url", "avatar_url")}
+    fields["avatar_sha256"] = avatar_sha256
+    fields["themes"] = get_available_themes()
+    fields["render_version"] = RENDER_VERSION
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Per-user manifest
+# ---------------------------------------------------------------------------
+
+def _read_manifest(folder_path: Path) -> Dict:
+    try:
+        return json.loads((folder_path / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(
+    folder_path: Path, digest: str, data: Dict, avatar_path: Path, save_paths: List[Dict[str, str]]
+) -> None:
+    manifest = {
+        "digest": digest,
+        "data": {key: data[key] for key in RENDER_FIELDS},
+        "avatar": avatar_path.relative_to(_storage_folder()).as_posix(),
+        "badges": [dict(theme=item["theme"], file=Path(item["path"]).name) for item in save_paths],
+    }
+    tmp = folder_path / f"{MANIFEST_NAME}.tmp"
+    tmp.write_text(json.dumps(manifest))
+    tmp.replace(folder_path / MANIFEST_NAME)
+
+
+def _stored_badges(folder_path: Path, digest: str) -> Optional[Tuple[List[Dict[str, str]], Path]]:
+    """The badges already on disk if they were rendered from ``digest``, else None."""
+    manifest = _read_manifest(folder_path)
+    if manifest.get("digest") != digest or "data" not in manifest:
+        return None
+    avatar_path = _storage_folder() / manifest["avatar"]
+    save_paths = [dict(theme=item["theme"], path=str(folder_path / item["file"])) for item in manifest["badges"]]
+    if not avatar_path.is_file() or not all(Path(item["path"]).is_file() for item in save_paths):
+        return None
+    return save_paths, avatar_path
+
 
+def stored_render_inputs(folder_name: str) -> Optional[Tuple[str, Dict, Path]]:
+    """``(digest, data, avatar_path)`` the user's stored badges were rendered from, if still on disk."""
+    manifest = _read_manifest(_storage_folder() / folder_name)
+    if "data" not in manifest:
+        return None
+    avatar_path = _storage_folder() / manifest["avatar"]
+    if not avatar_path.is_file():
+        return None
+    return manifest["digest"], manifest["data"], avatar_path
 
-def make_storage(api: RMAPI, data: Dict) -> Tuple[List[Dict[str, str]], Path, Path]:
+
+async def make_storage(api: AsyncRMAPI, data: Dict) -> Tuple[List[Dict[str, str]], Path, Path, str]:
+    """Store the avatar and render every theme (PNG and SVG), unless the folder already holds badges for the same inputs.
+
+    Also returns the input digest recorded in the folder's manifest.
+    """
     folder_path = _create_user_folder(data["fullname"])
-    avatar_path = _download_avatar(api, folder_path, data["avatar_url"])
-    save_paths = make_static_badges(data, str(folder_path), str(avatar_path))
-    return save_paths, folder_path, avatar_path
+    avatar = await avatar_store.fetch(api, data["avatar_url"])
+    digest = badge_fingerprint(data, avatar.sha256)
+    stored = _stored_badges(folder_path, digest)
+    if stored is not None:
+        save_paths, avatar_path = stored
+        return save_paths, folder_path, avatar_path, digest
+
+    avatar_path = avatar_store.path(avatar)
+    font_url = f"{os.environ.get('URL')}/{FONT_PATH}"
+    save_paths = await render_pool.render(data, str(folder_path), str(avatar_path), font_url)
+    _write_manifest(folder_path, digest, data, avatar_path, save_paths)
+    badge_server.invalidate_folder(folder_path)
+    return save_paths, folder_path, avatar_path, digest
 
 
-def make_storage_js(dynamic_js_badge: str, folder_path: Path) -> Path:
-    payload = base64.b64encode(dynamic_js_badge.encode()).decode()
-    js_content = f'document.write(window.atob("{payload}"))'
-    file_path = folder_path / "badge.js"
-    file_path.write_bytes(js_content.encode())
+def _write_if_changed(file_path: Path, content: bytes) -> Path:
+    try:
+        if file_path.read_bytes() == content:
+            return file_path
+    except OSError:
+        pass
+    file_path.write_bytes(content)
+    badge_server.discard(file_path)
     return file_path
+
+
+def make_storage_js(js_content: bytes, folder_path: Path) -> Path:
+    return _write_if_changed(folder_path / "badge.js", js_content)
+
+
+def make_storage_json(payload: bytes, folder_path: Path) -> Path:
+    return _write_if_changed(folder_path / BADGE_DATA_NAME, payload)
+
+
+def badge_data_path(folder_name: str) -> Path:
+    """Per-user JSON the embed loader draws the badge from."""
+    return _storage_folder() / folder_name / BADGE_DATA_NAME
@@ -0,0 +1,161 @@
+import base64
+import io
+import logging
+import os
+from functools import lru_cache
+from os.path import isdir
+from string import Template
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+from src.static_badge import (
+    DEFAULT_SIZE,
+    FONT_PATH,
+    THEMES,
+    avatar_thumbnail,
+    badge_from_data,
+    get_available_themes,
+    logo_box,
+    text_ascent,
+    theme_logo,
+)
+
+try:
+    from fontTools import subset as font_subset
+    from fontTools.ttLib import TTFont
+except ImportError:  # Optional: without it the font is referenced by URL instead of embedded.
+    font_subset = None
+
+log = logging.getLogger(__name__)
+
+FONT_FAMILY = "BebasNeue"
+
+
+# ---------------------------------------------------------------------------
+# Cached pieces
+# ---------------------------------------------------------------------------
+
+def _png_data_uri(image) -> str:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def _rgb(color: Tuple[int, int, int]) -> str:
+    return "#%02x%02x%02x" % color
+
+
+@lru_cache(maxsize=32)
+def _svg_template(theme: str, width: int, height: int) -> Template:
+    """Everything but the per-user values, which are left as ``$`` placeholders."""
+    colors = THEMES[theme]
+    (logo_x, logo_y), logo_side = logo_box(width, height)
+    logo = _png_data_uri(theme_logo(colors, logo_side))
+    return Template(
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" role="img" aria-label=$label_attr>'
+        f"<title>$label</title>"
+        f"<style>$font_face text{{font-family:{FONT_FAMILY},Impact,'Arial Narrow',sans-serif}}</style>"
+        f'<rect width="{width}" height="{height}" fill="{_rgb(colors.background_color)}"/>'
+        f'<image x="{logo_x}" y="{logo_y}" width="{logo_side}" height="{logo_side}" href="{logo}"/>'
+        f"$avatar$texts</svg>"
+    )
+
+
+@lru_cache(maxsize=64)
+def _font_subset(chars: str) -> Optional[str]:
+    """Base64 TrueType font reduced to ``chars``, or None without fontTools."""
+    if font_subset is None:
+        return None
+    options = font_subset.Options()
+    options.layout_features = []
+    options.name_IDs = []
+    options.hinting = False
+    subsetter = font_subset.Subsetter(options)
+    subsetter.populate(text=chars)
+    font = TTFont(FONT_PATH)
+    subsetter.subset(font)
+    buffer = io.BytesIO()
+    font.save(buffer)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def warm_font_subset() -> None:
+    """Load fontTools and the font file in a render worker before its first badge."""
+    _font_subset("0")
+
+
+def _font_face(text: str, font_url: Optional[str]) -> str:
+    # Each badge carries only its own glyphs; its themes and sizes share the subset.
+    embedded = _font_subset("".join(sorted(set(text))))
+    if embedded is not None:
+        src = f"url(data:font/ttf;base64,{embedded}) format('truetype')"
+    elif font_url:
+        src = f"url({font_url}) format('truetype')"
+    else:
+        return ""
+    return f"@font-face{{font-family:{FONT_FAMILY};src:{src}}}"
+
+
+@lru_cache(maxsize=256)
+def _avatar_uri(avatar_path: str, mtime_ns: int, side: int) -> str:
+    return _png_data_uri(avatar_thumbnail(avatar_path, side))
+
+
+# ---------------------------------------------------------------------------
+# Rendering
+# ---------------------------------------------------------------------------
+
+def render_svg(
+    data: Dict,
+    avatar_path: str,
+    theme: str = "light",
+    width: int = DEFAULT_SIZE[0],
+    height: int = DEFAULT_SIZE[1],
+    font_url: Optional[str] = None,
+) -> str:
+    """The badge of ``data`` (``extract_data`` output) as a standalone SVG document.
+
+    The avatar is inlined, since an SVG shown through ``<img>`` (README
+    embeds) may not load other resources. The font is embedded, reduced to
+    the characters used, when fontTools is installed, and loaded from
+    ``font_url`` otherwise.
+    """
+    badge = badge_from_data(data, avatar_path, theme, width, height)
+    (avatar_x, avatar_y), avatar_side = badge.avatar_box()
+    href = _avatar_uri(avatar_path, os.stat(avatar_path).st_mtime_ns, avatar_side)
+    avatar = (
+        f'<image x="{avatar_x}" y="{avatar_y}" width="{avatar_side}" height="{avatar_side}" '
+        f'preserveAspectRatio="none" href={quoteattr(href)}/>'
+    )
+
+    texts = []
+    for item in badge.text_items():
+        # Pillow places text by its ascender line, SVG by its baseline.
+        baseline = item.xy[1] + text_ascent(item.size)
+        texts.append(
+            f'<text x="{item.xy[0]}" y="{baseline}" font-size="{item.size}" '
+            f'fill="{_rgb(item.color)}">{escape(item.text)}</text>'
+        )
+
+    label = f"{data['name']} on Root-Me"
+    all_text = "".join(item.text for item in badge.text_items())
+    return _svg_template(theme, width, height).substitute(
+        label=escape(label),
+        label_attr=quoteattr(label),
+        font_face=_font_face(all_text, font_url),
+        avatar=avatar,
+        texts="".join(texts),
+    )
+
+
+def make_svg_badges(data: Dict, folder_path: str, avatar_path: str, font_url: Optional[str] = None) -> List[Dict[str, str]]:
+    if not isdir(folder_path):
+        raise IOError(f"The folder does not exist: '{folder_path}'")
+    save_paths = []
+    for theme in get_available_themes():
+        save_path = f"{folder_path}/static_badge_{theme}.svg"
+        with open(save_path, "w", encoding="utf-8") as f:
+            f.write(render_svg(data, avatar_path, theme, font_url=font_url))
+        save_paths.append(dict(theme=theme, path=save_path))
+    return save_paths
@@ -0,0 +1,76 @@
+"""Jinja setup for the web pages: compiled at startup, bytecode kept on disk.
+
+    python -m src.templating
+
+compiles every page template into the bytecode cache (the Docker image does
+it at build time), so a fresh process loads them instead of compiling.
+"""
+import hashlib
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from fastapi import Request
+from fastapi.responses import HTMLResponse, Response
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from starlette.templating import Jinja2Templates
+
+from src.badge_server import etag_matches
+
+log = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+TEMPLATES_DIR = BASE_DIR / "templates"
+PAGE_TEMPLATES = ("base.html", "index.html", "badge.html")
+
+
+def _bytecode_cache() -> Optional[FileSystemBytecodeCache]:
+    # Entries are keyed by template source checksum, so a stale cache is never used.
+    cache_dir = Path(os.environ.get("TEMPLATE_CACHE_DIR") or BASE_DIR / ".jinja_cache")
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+    except OSError as err:
+        log.warning("template_cache_unavailable", extra=dict(path=str(cache_dir), error=str(err)))
+        return None
+    return FileSystemBytecodeCache(str(cache_dir))
+
+
+def create_templates() -> Jinja2Templates:
+    env = Environment(loader=FileSystemLoader(str(TEMPLATES_DIR)), autoescape=True, bytecode_cache=_bytecode_cache())
+    return Jinja2Templates(env=env)
+
+
+def precompile(env: Environment, names: Iterable[str] = PAGE_TEMPLATES) -> Dict[str, float]:
+    """Load ``names`` into the environment's template cache; milliseconds spent per template."""
+    timings = {}
+    for name in names:
+        started = time.perf_counter()
+        env.get_template(name)
+        timings[name] = round((time.perf_counter() - started) * 1000, 2)
+    log.info("templates_precompiled", extra=dict(timings_ms=timings))
+    return timings
+
+
+class PrerenderedPage:
+    """A page that does not depend on the request, rendered once and served with an ETag."""
+
+    def __init__(self, content: bytes) -> None:
+        self.content = content
+        self.etag = f'"{hashlib.sha256(content).hexdigest()[:24]}"'
+
+    @classmethod
+    def render(cls, env: Environment, name: str, **context) -> "PrerenderedPage":
+        return cls(env.get_template(name).render(**context).encode())
+
+    def response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag}
+        if etag_matches(request, self.etag):
+            return Response(status_code=304, headers=headers)
+        return HTMLResponse(content=self.content, headers=headers)
+
+
+if __name__ == "__main__":
+    for template_name, elapsed_ms in precompile(create_templates().env).items():
+        print(f"{template_name:<16}{elapsed_ms:>8.2f} ms")
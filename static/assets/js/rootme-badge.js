@@ -0,0 +1,124 @@
+/* Root-Me badge loader.
+ *
+ *   <div data-rootme-badge="ID_AUTEUR"></div>
+ *   <script async src="https://BADGE_SERVER/badge/embed.js"></script>
+ *
+ * Fetches /badge/ID_AUTEUR.json for each placeholder and renders the badge
+ * into it. Loading the script again (several embeds) only renders the new
+ * placeholders.
+ */
+(function () {
+  "use strict";
+
+  if (window.RootMeBadge) {
+    window.RootMeBadge.scan();
+    return;
+  }
+
+  var script = document.currentScript;
+  // The loader is served at BASE/badge/embed.js: resolve BASE from its URL so a
+  // server mounted under a path prefix keeps that prefix.
+  var base = script ? new URL("..", new URL(script.src, document.baseURI)).href.replace(/\/$/, "") : "";
+
+  var STYLE = [
+    '@font-face{font-family:"Roboto";font-style:normal;font-weight:400;src:url(' + base + '/storage_server/htb-font.woff2) format("woff2")}',
+    ".rootme_badge{width:220px;height:50px;background-color:#343c41;border-radius:4px;text-align:left;",
+    "background-image:url(" + base + "/storage_server/skull-white.png);background-size:20px 20px;",
+    "background-position:right 2px bottom 3px;background-repeat:no-repeat}",
+    ".rootme_avatar{width:40px;height:40px;border-radius:4px;float:left;margin-top:5px;margin-left:5px}",
+    ".rootme_font{font-family:\"Roboto\",monospace;float:left;height:40px;padding-left:5px;margin-top:5px}",
+    ".rootme_nickname{color:#ffffff;font-size:12px;font-weight:bold}",
+    ".rootme_points{color:#4bb7ef;font-size:10px;position:relative;right:11px}",
+    ".rootme_top{color:#ffae01;font-size:10px;position:relative;right:20px}",
+    ".rootme_ranking{color:#ffffff;font-size:10px}",
+    ".rootme_line{line-height:12px;margin:0px;padding:0px}",
+    ".rootme_link,.rootme_link:visited{color:#9acc14;font-size:0.6em;text-decoration:none}",
+    ".rootme_link:hover{text-decoration:underline}",
+    ".rootme_rank{color:#ffffff;font-size:11px}",
+    ".rootme_icon_target{position:relative;top:2px;right:4px;width:10px;height:10px}",
+    ".rootme_icon_star{position:relative;top:1.8px;right:14px;width:10px;height:10px}"
+  ].join("");
+
+  function el(tag, className, text) {
+    var node = document.createElement(tag);
+    if (className) node.className = className;
+    if (text !== undefined) node.textContent = text;
+    return node;
+  }
+
+  function img(className, src) {
+    var node = el("img", className);
+    node.src = src;
+    node.alt = "";
+    return node;
+  }
+
+  function line(children) {
+    var p = el("p", "rootme_line");
+    children.forEach(function (child) {
+      p.appendChild(child);
+      p.appendChild(document.createTextNode(" "));
+    });
+    return p;
+  }
+
+  function injectStyle() {
+    if (document.getElementById("rootme-badge-style")) return;
+    var style = el("style");
+    style.id = "rootme-badge-style";
+    style.textContent = STYLE;
+    document.head.appendChild(style);
+  }
+
+  function render(target, user) {
+    var badge = el("div", "rootme_badge");
+    badge.appendChild(img("rootme_avatar", user.avatar_url));
+
+    var text = el("div", "rootme_font");
+    text.appendChild(line([el("span", "rootme_nickname", user.name), el("span", "rootme_rank", user.rank)]));
+    text.appendChild(line([
+      el("span", "rootme_ranking", "Score:" + user.score),
+      img("rootme_icon_target", base + "/storage_server/target.png"),
+      el("span", "rootme_points", user.solved + "/" + user.challenges),
+      img("rootme_icon_star", base + "/storage_server/star.png"),
+      el("span", "rootme_top", user.top)
+    ]));
+    var link = el("a", "rootme_link", "root-me.org");
+    link.href = "https://www.root-me.org";
+    text.appendChild(line([link]));
+    badge.appendChild(text);
+
+    target.textContent = "";
+    target.appendChild(badge);
+  }
+
+  function load(target) {
+    var id = target.getAttribute("data-rootme-badge");
+    target.setAttribute("data-rootme-badge-state", "loading");
+    fetch(base + "/badge/" + encodeURIComponent(id) + ".json")
+      .then(function (response) {
+        if (!response.ok) throw new Error("HTTP " + response.status);
+        return response.json();
+      })
+      .then(function (user) {
+        render(target, user);
+        target.setAttribute("data-rootme-badge-state", "done");
+      })
+      .catch(function () {
+        target.setAttribute("data-rootme-badge-state", "error");
+      });
+  }
+
+  function scan() {
+    injectStyle();
+    var targets = document.querySelectorAll("[data-rootme-badge]:not([data-rootme-badge-state])");
+    Array.prototype.forEach.call(targets, load);
+  }
+
+  window.RootMeBadge = { scan: scan };
+  if (document.readyState === "loading") {
+    document.addEventListener("DOMContentLoaded", scan);
+  } else {
+    scan();
+  }
+})();